@@ -0,0 +1,21 @@
+'''
+Description: 异步示例的统一入口，有 uvloop 时使用 uvloop 事件循环
+'''
+import asyncio
+from typing import Any, Coroutine, TypeVar
+
+# uvloop 不支持 Windows，不可用时退回默认事件循环
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+T = TypeVar("T")
+
+
+def run_async(main: Coroutine[Any, Any, T]) -> T:
+    """替代 asyncio.run：优先在 uvloop 事件循环上运行协程"""
+    if UVLOOP_AVAILABLE:
+        return uvloop.run(main)
+    return asyncio.run(main)
@@ -0,0 +1,139 @@
+'''
+Description: chain 模块共享的 HTTP 连接池与 DashScope 聊天模型工厂
+'''
+import asyncio
+import os
+import time
+from collections import deque
+from functools import lru_cache
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+# DashScope OpenAI 兼容接口
+DASHSCOPE_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+
+# 空闲连接保留 60 秒（默认 5 秒），多轮对话两次请求之间的间隔不会让连接被回收后重新握手
+HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60.0)
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+# HTTP/2 需要 h2 包（httpx[http2]），可用时多个请求复用同一条连接
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 账号级配额，可通过环境变量覆盖
+DASHSCOPE_RPM = int(os.getenv("DASHSCOPE_RPM", "600"))
+DASHSCOPE_TPM = int(os.getenv("DASHSCOPE_TPM", "1000000"))
+
+
+class LoopLocalTransport(httpx.AsyncBaseTransport):
+    """按事件循环分别维护连接池。
+    异步连接绑定创建它的事件循环，同步入口每次 asyncio.run 都是新循环，
+    沿用旧循环的连接会报 Event loop is closed；同一循环内的请求仍复用同一连接池
+    """
+
+    def __init__(self, **transport_kwargs):
+        self._transport_kwargs = transport_kwargs
+        self._transports = {}
+
+    def _get_transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            # 顺带丢弃已关闭循环的连接池，其连接已无法再使用
+            for closed_loop in [l for l in self._transports if l.is_closed()]:
+                del self._transports[closed_loop]
+            transport = self._transports[loop] = httpx.AsyncHTTPTransport(**self._transport_kwargs)
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._get_transport().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+@lru_cache(maxsize=None)
+def get_async_transport() -> LoopLocalTransport:
+    """进程内共享的异步连接池，按事件循环区分"""
+    return LoopLocalTransport(http2=HTTP2_AVAILABLE, limits=HTTP_LIMITS)
+
+
+@lru_cache(maxsize=None)
+def get_async_client() -> httpx.AsyncClient:
+    """进程内共享的异步 HTTP 客户端，所有模型复用；连接池按事件循环区分，可跨多次 asyncio.run 使用"""
+    return httpx.AsyncClient(transport=get_async_transport(), timeout=HTTP_TIMEOUT)
+
+
+@lru_cache(maxsize=None)
+def get_sync_client() -> httpx.Client:
+    """进程内共享的同步 HTTP 客户端"""
+    return httpx.Client(http2=HTTP2_AVAILABLE, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+
+
+def create_dashscope_chat(model: str, **kwargs) -> ChatOpenAI:
+    """创建走 DashScope 兼容接口、复用共享连接池的聊天模型"""
+    return ChatOpenAI(
+        model=model,
+        api_key=os.getenv("DASHSCOPE_API_KEY"),
+        base_url=DASHSCOPE_BASE_URL,
+        http_client=get_sync_client(),
+        http_async_client=get_async_client(),
+        **kwargs
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本 token 数，用于客户端限流"""
+    return len(text) // 3 + 1
+
+
+class TokenBucket:
+    """客户端 RPM/TPM 限流器：按 60 秒滑动窗口平滑请求，避免触发服务端 429 后的退避重试"""
+
+    WINDOW_SECONDS = 60.0
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._events = deque()  # (时间戳, token 数)
+        self._tokens_in_window = 0
+        self._lock = None
+        self._loop = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        # 同步入口每次 asyncio.run 都会新建事件循环，锁需跟随当前循环重建
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    def _expire(self, now: float) -> None:
+        while self._events and now - self._events[0][0] >= self.WINDOW_SECONDS:
+            _, tokens = self._events.popleft()
+            self._tokens_in_window -= tokens
+
+    async def acquire(self, tokens: int = 1) -> None:
+        """占用一次请求和 tokens 个 token 的配额，配额不足时等待窗口滑出"""
+        tokens = min(tokens, self.tpm)
+        async with self._get_lock():
+            while True:
+                now = time.monotonic()
+                self._expire(now)
+                if len(self._events) < self.rpm and self._tokens_in_window + tokens <= self.tpm:
+                    self._events.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return
+                await asyncio.sleep(self._events[0][0] + self.WINDOW_SECONDS - now)
+
+
+@lru_cache(maxsize=None)
+def get_rate_limiter() -> TokenBucket:
+    """进程内共享的 DashScope 限流器"""
+    return TokenBucket(rpm=DASHSCOPE_RPM, tpm=DASHSCOPE_TPM)
@@ -8,11 +8,14 @@ Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查
 '''
 from chain.custom_prompt_template import CustomPromptTemplate, PersonInfo
 from optparse import Values
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, field_validator
 from typing import Dict, List, Any, Optional
 import json
 from datetime import datetime
 
+# 支持的分析类型
+_VALID_ANALYSIS_TYPES: frozenset = frozenset(("basic", "career", "skills", "comprehensive"))
+
 
 class AdvancedPersonInfoPromptTemplate(CustomPromptTemplate):
     """
@@ -20,11 +23,22 @@ class AdvancedPersonInfoPromptTemplate(CustomPromptTemplate):
     支持更多工程化功能
     """
 
+    # 模板配置创建后不再变化：冻结实例并拒绝未声明的字段
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     template_version:str = Field(default="1.0.0", description="模版版本号")
     supported_languages: List[str] = Field(default=["chinese", "english"], description="支持的语言列表")
     enable_cache: bool = Field(default=True, description="是否启用缓存")
     cache_ttl: int = Field(default=3600, description="缓存过期时间（秒）")
 
+    # supported_languages 的集合形式，实例冻结后只需构建一次；
+    # 私有属性不进入 __dict__，partial() 按字段复制实例时不会被当作未声明字段拒绝
+    _supported_language_set: frozenset = PrivateAttr(default=frozenset())
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        self._supported_language_set = frozenset(self.supported_languages)
+
     def format_with_validation(self, **kwargs:Any) -> str:
         """带验证的格式化方法"""
         self._validate_inputs(**kwargs)
@@ -38,11 +52,10 @@ class AdvancedPersonInfoPromptTemplate(CustomPromptTemplate):
         if not person_info:
             raise ValueError("person_info 参数不能为空")
         
-        valid_analysis_types = ["basic", "career", "skills", "comprehensive"]
-        if analysis_type not in valid_analysis_types:
-            raise ValueError(f"analysis_type 参数无效，有效值包括：{valid_analysis_types}")
+        if analysis_type not in _VALID_ANALYSIS_TYPES:
+            raise ValueError(f"analysis_type 参数无效，有效值包括：{sorted(_VALID_ANALYSIS_TYPES)}")
 
-        if self.output_language not in self.supported_languages:
+        if self.output_language not in self._supported_language_set:
             raise ValueError(f"output_language 参数无效，有效值包括：{self.supported_languages}")
 
     def get_template_metadata(self) -> Dict[str,Any]:
@@ -6,14 +6,22 @@ LastEditTime: 2025-12-23 15:29:23
 FilePath: /RAG_service/chain/chat_chain.py
 Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查看配置 进行设置: https://github.com/OBKoro1/koro1FileHeader/wiki/%E9%85%8D%E7%BD%AE
 '''
+import sys
+import os
+
+# 添加项目根目录到Python路径，直接以脚本运行时也能导入 chain 包
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.messages import HumanMessage,AIMessage,SystemMessage
-from langchain_community.llms import Tongyi
-from typing import List, Dict, Any
+from langchain_core.messages.utils import count_tokens_approximately
+from chain._http import create_dashscope_chat, get_rate_limiter
+from typing import AsyncIterator, List, Dict, Any
 import asyncio
-import os
+import itertools
+from functools import lru_cache
 from dotenv import load_dotenv  
 
 # 加载环境变量
@@ -26,32 +34,62 @@ try:
 except (ImportError, AttributeError):
     pass  # 如果langchain_classic模块不存在或没有verbose属性，则忽略
 
+# 历史对话的 token 预算，超出部分从最早的轮次开始丢弃
+MAX_HISTORY_TOKENS = 2048
+
+@lru_cache(maxsize=4096)
+def _count_tokens(text: str) -> int:
+    # 与 memory 模块相同的近似估算：不依赖分词器文件，导入时无需下载；
+    # 预算只用于截断历史和限流，不必与 Qwen 分词结果完全一致
+    return count_tokens_approximately([text])
+
+def _turn_tokens(item: Dict) -> int:
+    return _count_tokens(item["user_message"]) + _count_tokens(item["bot_reply"])
+
+def _trim_history(history: List[Dict], max_tokens: int = MAX_HISTORY_TOKENS) -> List[Dict]:
+    """从最新一轮向前保留对话，直到累计 token 数达到预算"""
+    kept = []
+    total = 0
+    for item in reversed(history):
+        total += _turn_tokens(item)
+        if total > max_tokens:
+            break
+        kept.append(item)
+    kept.reverse()
+    return kept
+
+# 固定的系统提示作为请求的公共前缀，进程内只构建一次，保证每次请求的前缀字节完全一致，
+# 便于服务端前缀缓存命中；动态的历史和用户消息始终排在其后
+CHAT_SYSTEM_PROMPT = """你是一个智能客服助手，请遵循以下规则：
+1. 友好、专业地回答用户问题
+2. 如果不确定答案，诚实地说不知道
+3. 保持回答简洁明了
+4. 根据对话历史提供连贯的回复
+5. 用中文回答"""
+
+# 输出解析器无状态，所有 ChatChain 实例共用
+_STR_PARSER = StrOutputParser()
+
+CHAT_PROMPT = ChatPromptTemplate.from_messages([
+    SystemMessage(content=[{
+        "type": "text",
+        "text": CHAT_SYSTEM_PROMPT,
+        "cache_control": {"type": "ephemeral"},
+    }]),
+    MessagesPlaceholder(variable_name="history"),
+    ("human", "{message}")
+])
+
 class ChatChain:
     def __init__(self):
         self.llm = None
         self.chain = None
-        self.parser = StrOutputParser()
+        self.parser = _STR_PARSER
 
     async def initialize(self):
-        # 从环境变量中获取API密钥
-        dashscope_api_key = os.getenv("DASHSCOPE_API_KEY")
-        
-        self.llm = Tongyi(
-            temperature=0.8,
-            model_name="gwen-plus",
-            dashscope_api_key=dashscope_api_key
-        )
+        self.llm = create_dashscope_chat("qwen-plus", temperature=0.8, streaming=True)
 
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", """你是一个智能客服助手，请遵循以下规则：
-                1. 友好、专业地回答用户问题
-                2. 如果不确定答案，诚实地说不知道
-                3. 保持回答简洁明了
-                4. 根据对话历史提供连贯的回复
-                5. 用中文回答"""),
-            MessagesPlaceholder(variable_name="history"),
-            ("human", "{message}")
-        ])
+        self.prompt = CHAT_PROMPT
 
         self.chain = (
             RunnablePassthrough.assign(history=self._format_history)
@@ -60,17 +98,22 @@ class ChatChain:
             | self.parser
         )
 
+    async def stream_message(self, message: str, history: List[Dict] = None) -> AsyncIterator[str]:
+        """流式处理用户消息，逐个产出模型生成的文本片段"""
+        input_data = {
+            "message": message,
+            "raw_history": history or []
+        }
+        history_tokens = sum(_turn_tokens(item) for item in _trim_history(input_data["raw_history"]))
+        await get_rate_limiter().acquire(_count_tokens(message) + history_tokens)
+        async for chunk in self.chain.astream(input_data):
+            yield chunk
+
     async def process_message(self,message:str,history:List[Dict] = None) -> str:
         """处理用户消息"""
         try:
-            input_data = {
-                "message":message,
-                "raw_history": history or []
-            }
-
-            response = await self.chain.ainvoke(input_data)
-
-            return response.strip()
+            chunks = [chunk async for chunk in self.stream_message(message, history)]
+            return "".join(chunks).strip()
 
         except Exception as e:
             print(f"处理消息时出错: {e}")
@@ -79,15 +122,9 @@ class ChatChain:
     def _format_history(self,input_data:Dict[str,Any]) -> List:
             """格式化历史消息为 LangChain 消息格式"""
             history = input_data.get("raw_history",[])
+            human, ai = HumanMessage, AIMessage
 
-            if not history:
-                return []
-
-            message = []
-
-            recent_history = history[-5:] if len(history) > 5 else history
-
-            for item in recent_history:
-                message.append(HumanMessage(content=item["user_message"]))
-                message.append(AIMessage(content=item["bot_reply"]))
-            return message
\ No newline at end of file
+            return list(itertools.chain.from_iterable(
+                (human(content=item["user_message"]), ai(content=item["bot_reply"]))
+                for item in _trim_history(history)
+            ))
\ No newline at end of file
@@ -8,27 +8,45 @@ Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查
 '''
 from langchain_community.chat_models import ChatTongyi
 from dotenv import load_dotenv
+import asyncio
 import os
 
 load_dotenv()
 
-# 打印环境变量是否设置
-print(f"DASHSCOPE_API_KEY is set: {os.getenv('DASHSCOPE_API_KEY') is not None}")
-
 # 尝试使用不同的模型名称
 model_names = ["qwen-turbo", "qwen-plus", "qwen-max", "qwen-vl-plus"]
 
-for model_name in model_names:
+
+async def probe(model_name: str):
+    """探测单个模型是否可用"""
+    llm = ChatTongyi(
+        model_name=model_name,
+        temperature=0.7,
+        streaming=True
+    )
+    # 尝试简单调用
+    return model_name, await llm.ainvoke("你好，测试一下")
+
+
+async def main():
+    """并发探测所有模型，返回第一个调用成功的结果"""
+    tasks = [asyncio.create_task(probe(model_name)) for model_name in model_names]
     try:
-        print(f"\nTrying model: {model_name}")
-        llm = ChatTongyi(
-            model_name=model_name,
-            temperature=0.7,
-            streaming=True
-        )
-        # 尝试简单调用
-        response = llm.invoke("你好，测试一下")
-        print(f"Success! Response: {response}")
-        break
-    except Exception as e:
-        print(f"Error: {e}")
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                model_name, response = await next_done
+            except Exception as e:
+                print(f"Error: {e}")
+                continue
+            print(f"Success with {model_name}! Response: {response}")
+            return model_name, response
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+if __name__ == "__main__":
+    # 打印环境变量是否设置
+    print(f"DASHSCOPE_API_KEY is set: {os.getenv('DASHSCOPE_API_KEY') is not None}")
+    asyncio.run(main())
@@ -12,123 +12,150 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from langchain_core.output_parsers import BaseOutputParser
 from langchain_core.exceptions import OutputParserException
-from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnableBranch, RunnableLambda, RunnableSequence
-from langchain_community.llms import Tongyi
+from langchain_core.messages import SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda, RunnableSequence
 from typing import Dict, List, Optional
-import json
+import ahocorasick
+import asyncio
+import hashlib
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+import orjson
 import time
 import logging
 from dotenv import load_dotenv
-from utils.request_backoff import retry_with_backoff, timeout_handler
+from utils.request_backoff import aretry_with_backoff, atimeout_handler, retry_with_backoff, timeout_handler
+from chain._http import create_dashscope_chat, estimate_tokens, get_rate_limiter
 
 load_dotenv()
 # 设置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 路由关键词（问题会先转小写再匹配，关键词统一使用小写）
+TECH_KEYWORDS = ("bug", "错误", "故障", "技术", "api", "代码", "系统", "登录", "密码")
+BILLING_KEYWORDS = ("账单", "费用", "付款", "充值", "退款", "价格", "订单")
+
+# 单次回复的最大 token 数
+MAX_REPLY_TOKENS = 500
+
+# 批处理并发上限，避免瞬时请求超过服务商 RPM 配额
+BATCH_MAX_CONCURRENCY = 16
+
+# 可按内容缓存的值类型；True、1、1.0 以及 0.0、-0.0 彼此相等且哈希相同，缓存键需带上 repr 才能区分
+_CACHEABLE_VALUE_TYPES = (str, int, float, bool, type(None))
+
+@lru_cache(maxsize=2048)
+def _dump_user_info(items: tuple) -> str:
+    return orjson.dumps({key: value for key, _, value in items}).decode()
+
+def _serialize_user_info(user_info: Dict) -> str:
+    """序列化用户信息；值均为标量的扁平字典按内容缓存，同一用户的重复请求不再重复编码"""
+    if not all(isinstance(value, _CACHEABLE_VALUE_TYPES) for value in user_info.values()):
+        # 含嵌套字典/列表等值时直接编码
+        return orjson.dumps(user_info).decode()
+    try:
+        return _dump_user_info(tuple(sorted((key, repr(value), value) for key, value in user_info.items())))
+    except TypeError:
+        # 键的类型不一致、无法排序时直接编码
+        return orjson.dumps(user_info).decode()
+
+FORMAT_INSTRUCTIONS = """请以JSON格式回复：
+{
+    "response": "回复内容",
+    "category": "问题类别(technical/billing/general)",
+    "confidence": 0.9,
+    "requires_human": false
+}"""
+
+# 各类问题的角色说明
+TECH_ROLE_INSTRUCTION = "你是技术支持专家，请回答用户的技术问题，提供专业的技术解答。"
+BILLING_ROLE_INSTRUCTION = "你是账单客服专员，请处理用户的账单相关问题，提供准确的账单信息和解决方案。"
+GENERAL_ROLE_INSTRUCTION = "你是客服代表，请友好地回答用户问题，提供有帮助的回复。"
+
+@dataclass(slots=True)
+class PerformanceStats:
+    """性能统计"""
+    total_requests: int = 0
+    successful_requests: int = 0
+    failed_requests: int = 0
+    average_response_time: float = 0.0
+
 class CustomerServiceResponse(BaseOutputParser[Dict]):
     """客服响应解析器"""
     def parse(self, text: str) -> Dict:
         """解析输出"""
-        try:
-            # 尝试解析JSON格式
-            if '{' in text and '}' in text:
-                start = text.find('{')
-                end = text.rfind('}') + 1
-                json_str = text[start:end]
-                return json.loads(json_str)
-            
-            # 如果不是JSON，返回简单格式
-            return {
-                "response": text.strip(),
-                "category": "general",
-                "confidence": 0.8,
-                "requires_human": False
-            }
-        except json.JSONDecodeError:
-            raise OutputParserException(f"解析失败: {e}")
+        # 尝试解析JSON格式
+        start = text.find('{')
+        end = text.rfind('}')
+        if start != -1 and end > start:
+            try:
+                return orjson.loads(text[start:end + 1])
+            except orjson.JSONDecodeError as e:
+                raise OutputParserException(f"解析失败: {e}")
+
+        # 如果不是JSON，返回简单格式
+        return {
+            "response": text.strip(),
+            "category": "general",
+            "confidence": 0.8,
+            "requires_human": False
+        }
     def get_format_instructions(self) -> str:
-         return """请以JSON格式回复：
-            {
-            "response": "回复内容",
-            "category": "问题类别(technical/billing/general)",
-            "confidence": 0.9,
-            "requires_human": false
-        }"""
+        return FORMAT_INSTRUCTIONS
 
-   
 
 class EnterpriseCustomerService:
     def __init__(self):
         self.setup_models()
         self.setup_chain()
         self.setup_fallback_system()
-        self.performance_stats = {    # 性能统计
-            "total_requests": 0,
-            "successful_requests": 0,
-            "failed_requests": 0,
-            "average_response_time": 0.0
-        }
+        self.performance_stats = PerformanceStats()    # 性能统计
 
     def setup_models(self):
-        self.primary_model = Tongyi(
-            model_name="qwen-max",
+        # 主备模型共享同一个 HTTP 连接池
+        self.primary_model = create_dashscope_chat(
+            "qwen-max",
             temperature=0.3,
-            max_tokens=500
+            max_tokens=MAX_REPLY_TOKENS
         )
 
-        self.backup_model = Tongyi(
-            model_name="qwen-plus",
+        self.backup_model = create_dashscope_chat(
+            "qwen-plus",
             temperature=0.7,
-            max_tokens=500
+            max_tokens=MAX_REPLY_TOKENS
         )
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _build_prompt(role_instruction: str) -> ChatPromptTemplate:
+        """构建提示模板：静态的格式要求与角色说明放在 system 前缀中，便于服务端缓存命中，
+        用户信息和问题只出现在末尾的 human 消息里。模板只依赖角色说明，按类缓存复用。
+        三类问题共用的格式要求排在最前，不同类别之间也能共享同一段缓存前缀"""
+        system_message = SystemMessage(content=[{
+            "type": "text",
+            "text": f"{FORMAT_INSTRUCTIONS}\n\n{role_instruction}",
+            "cache_control": {"type": "ephemeral"},
+        }])
+        return ChatPromptTemplate.from_messages([
+            system_message,
+            ("human", "用户信息：{user_info}\n问题：{question}")
+        ])
+
     def setup_chain(self):
         self.parser = CustomerServiceResponse()
-         
-        # 技术问题处理链
-        tech_prompt = PromptTemplate(
-            input_variables=["question", "user_info"],
-            template="""你是技术支持专家，请回答用户的技术问题。
+        self._router_ac = self._build_router_automaton()
 
-                用户信息：{user_info}
-                问题：{question}
-
-                {format_instructions}
+        # 技术问题处理链
+        tech_prompt = self._build_prompt(TECH_ROLE_INSTRUCTION)
 
-                请提供专业的技术解答。""",
-            partial_variables={"format_instructions": self.parser.get_format_instructions()}
-        )
-        
         # 账单问题处理链
-        billing_prompt = PromptTemplate(
-            input_variables=["question", "user_info"],
-            template="""你是账单客服专员，请处理用户的账单相关问题。
-
-            用户信息：{user_info}
-            问题：{question}
+        billing_prompt = self._build_prompt(BILLING_ROLE_INSTRUCTION)
 
-            {format_instructions}
-
-            请提供准确的账单信息和解决方案。""",
-            partial_variables={"format_instructions": self.parser.get_format_instructions()}
-        )
-        
         # 通用问题处理链
-        general_prompt = PromptTemplate(
-            input_variables=["question", "user_info"],
-            template="""你是客服代表，请友好地回答用户问题。
+        general_prompt = self._build_prompt(GENERAL_ROLE_INSTRUCTION)
 
-        用户信息：{user_info}
-        问题：{question}
-
-        {format_instructions}
-
-        请提供有帮助的回复。""",
-            partial_variables={"format_instructions": self.parser.get_format_instructions()}
-        )
-        
         # 创建处理链
         self.tech_chain = tech_prompt | self.primary_model | self.parser
         self.billing_chain = billing_prompt | self.primary_model | self.parser
@@ -137,8 +164,17 @@ class EnterpriseCustomerService:
     def setup_fallback_system(self):
         """设置容错系统"""
         
+        busy_response = {
+            "response": "抱歉，系统暂时繁忙，请稍后重试或联系人工客服。",
+            "category": "system_error",
+            "confidence": 1.0,
+            "requires_human": True
+        }
+
         # 创建带有回退机制的处理函数
         def create_fallback_chain(primary_chain, chain_name):
+            backup_chain = primary_chain.first | self.backup_model | self.parser
+
             def fallback_processor(input_data):
                 try:
                     # 第一层：主要链处理
@@ -147,57 +183,88 @@ class EnterpriseCustomerService:
                     logger.warning(f"{chain_name} 主链失败，尝试备用模型: {e}")
                     try:
                         # 第二层：备用模型处理
-                        backup_chain = primary_chain.first | self.backup_model | self.parser
                         return backup_chain.invoke(input_data)
                     except Exception as e2:
                         logger.error(f"{chain_name} 备用模型失败，使用简单响应: {e2}")
                         # 第三层：简单响应
-                        return {
-                            "response": "抱歉，系统暂时繁忙，请稍后重试或联系人工客服。",
-                            "category": "system_error",
-                            "confidence": 1.0,
-                            "requires_human": True
-                        }
-            
-            return RunnableLambda(fallback_processor)
-        
+                        return dict(busy_response)
+
+            async def afallback_processor(input_data):
+                try:
+                    return await primary_chain.ainvoke(input_data)
+                except Exception as e:
+                    logger.warning(f"{chain_name} 主链失败，尝试备用模型: {e}")
+                    try:
+                        return await backup_chain.ainvoke(input_data)
+                    except Exception as e2:
+                        logger.error(f"{chain_name} 备用模型失败，使用简单响应: {e2}")
+                        return dict(busy_response)
+
+            return RunnableLambda(fallback_processor, afunc=afallback_processor)
+
         # 为每个链添加回退机制
         self.tech_chain_with_fallback = create_fallback_chain(self.tech_chain, "技术支持")
         self.billing_chain_with_fallback = create_fallback_chain(self.billing_chain, "账单服务")
         self.general_chain_with_fallback = create_fallback_chain(self.general_chain, "通用服务")
-        # 建智能路由分支
-        self.smart_router = RunnableBranch(
-            (self._is_technical_question, self.tech_chain_with_fallback),
-            (self._is_billing_question, self.billing_chain_with_fallback),
-            self.general_chain_with_fallback  # 默认分支
-        )
-    
-    def _is_technical_question(self, x: Dict) -> bool:
-        """判断是否为技术问题"""
-        question = x.get("question", "").lower()
-        tech_keywords = ["bug", "错误", "故障", "技术", "API", "代码", "系统", "登录", "密码"]
-        return any(keyword in question for keyword in tech_keywords)
-    
-    def _is_billing_question(self, x: Dict) -> bool:
-        """判断是否为账单问题"""
-        question = x.get("question", "").lower()
-        billing_keywords = ["账单", "费用", "付款", "充值", "退款", "价格", "订单"]
-        return any(keyword in question for keyword in billing_keywords)
+        # 建智能路由：一次分类后按标签直接查表分发
+        self._chain_by_label = {
+            "tech": self.tech_chain_with_fallback,
+            "billing": self.billing_chain_with_fallback,
+            "general": self.general_chain_with_fallback,  # 默认分支
+        }
+
+        def route(x: Dict) -> Dict:
+            return self._chain_by_label[self._classify(x.get("question", ""))].invoke(x)
+
+        async def aroute(x: Dict) -> Dict:
+            return await self._chain_by_label[self._classify(x.get("question", ""))].ainvoke(x)
+
+        self.smart_router = RunnableLambda(route, afunc=aroute)
     
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _build_router_automaton() -> ahocorasick.Automaton:
+        """构建关键词自动机，一次扫描即可完成问题分类"""
+        automaton = ahocorasick.Automaton()
+        for keyword in TECH_KEYWORDS:
+            automaton.add_word(keyword, "tech")
+        for keyword in BILLING_KEYWORDS:
+            automaton.add_word(keyword, "billing")
+        automaton.make_automaton()
+        return automaton
+
+    def _classify(self, question: str) -> str:
+        """问题分类：技术关键词优先于账单关键词，均未命中则为通用问题"""
+        label = "general"
+        for _, matched in self._router_ac.iter(question.lower()):
+            if matched == "tech":
+                return "tech"
+            label = matched
+        return label
+
     @retry_with_backoff(max_attempts=3,base_delay=1.0)
     @timeout_handler(time_seconds = 30.0)
     def _process_with_retry_and_timeout(self, input_data:Dict) -> Dict:
         return self.smart_router.invoke(input_data)
 
-        
+    @aretry_with_backoff(max_attempts=3, base_delay=1.0)
+    @atimeout_handler(time_seconds=30.0)
+    async def _aprocess_with_retry_and_timeout(self, input_data: Dict) -> Dict:
+        # 每次重试都会重新占用限流配额
+        await get_rate_limiter().acquire(
+            estimate_tokens(FORMAT_INSTRUCTIONS + input_data["question"] + input_data["user_info"])
+            + MAX_REPLY_TOKENS
+        )
+        return await self.smart_router.ainvoke(input_data)
+
     def process_customer_inquiry(self,question:str,user_info:Dict) -> Dict:
         start_time = time.time()
-        self.performance_stats["total_requests"] += 1
+        self.performance_stats.total_requests += 1
         try:
             logger.info(f"处理客户咨询: {question[:50]}...")
             input_data = {
                 "question": question,
-                "user_info": json.dumps(user_info, ensure_ascii=False)
+                "user_info": _serialize_user_info(user_info)
             }
             result = self._process_with_retry_and_timeout(input_data)
 
@@ -207,7 +274,7 @@ class EnterpriseCustomerService:
             result["status"] = "success"
             
             # 更新性能统计
-            self.performance_stats["successful_requests"] += 1
+            self.performance_stats.successful_requests += 1
             self._update_average_response_time(processing_time)
             
             logger.info(f"处理完成，耗时: {processing_time}秒")
@@ -215,41 +282,109 @@ class EnterpriseCustomerService:
             return result
         except Exception as e:
             processing_time = round(time.time() - start_time, 2)
-            self.performance_stats["failed_requests"] += 1
+            self.performance_stats.failed_requests += 1
             
             logger.error(f"处理失败: {e}")
-            return {
-                "response": "系统出现异常，请联系技术支持。",
-                "category": "system_error",
-                "confidence": 0.0,
-                "requires_human": True,
-                "status": "error",
-                "error": str(e),
-                "processing_time": processing_time
+            return self._error_response(e, processing_time)
+
+    async def aprocess_customer_inquiry(self, question: str, user_info: Dict) -> Dict:
+        """异步处理客户咨询"""
+        start_time = time.time()
+        self.performance_stats.total_requests += 1
+        try:
+            logger.info(f"处理客户咨询: {question[:50]}...")
+            input_data = {
+                "question": question,
+                "user_info": _serialize_user_info(user_info)
             }
+            result = await self._aprocess_with_retry_and_timeout(input_data)
+
+            processing_time = round(time.time() - start_time, 2)
+            result["processing_time"] = processing_time
+            result["status"] = "success"
+
+            self.performance_stats.successful_requests += 1
+            self._update_average_response_time(processing_time)
+
+            logger.info(f"处理完成，耗时: {processing_time}秒")
+
+            return result
+        except Exception as e:
+            processing_time = round(time.time() - start_time, 2)
+            self.performance_stats.failed_requests += 1
+
+            logger.error(f"处理失败: {e}")
+            return self._error_response(e, processing_time)
+
+    def _error_response(self, error: BaseException, processing_time: float) -> Dict:
+        """构造异常响应"""
+        return {
+            "response": "系统出现异常，请联系技术支持。",
+            "category": "system_error",
+            "confidence": 0.0,
+            "requires_human": True,
+            "status": "error",
+            "error": str(error),
+            "processing_time": processing_time
+        }
 
     def _update_average_response_time(self, new_time: float):
-        """更新平均响应时间"""
-        total_successful = self.performance_stats["successful_requests"]
-        current_avg = self.performance_stats["average_response_time"]
-        
-        # 计算新的平均值
-        new_avg = ((current_avg * (total_successful - 1)) + new_time) / total_successful
-        self.performance_stats["average_response_time"] = round(new_avg, 2)
+        """更新平均响应时间（增量均值）"""
+        stats = self.performance_stats
+        stats.average_response_time += (new_time - stats.average_response_time) / stats.successful_requests
 
-    def batch_process_inquiries(self, inquiries:List[Dict]) -> List[Dict]:
-        """批处理查询"""
-        logger.info(f"开始批处理{len(inquiries)}个查询")
-        results = []
+    @staticmethod
+    def _inquiry_key(inquiry: Dict) -> bytes:
+        """查询去重键：问题与用户信息相同即视为同一查询"""
+        payload = inquiry['question'].encode() + b"\0" + orjson.dumps(
+            inquiry['user_info'], option=orjson.OPT_SORT_KEYS
+        )
+        return hashlib.blake2b(payload, digest_size=16).digest()
+
+    async def abatch_process_inquiries(
+        self, inquiries: List[Dict], max_concurrency: int = BATCH_MAX_CONCURRENCY
+    ) -> List[Dict]:
+        """并发批处理查询，重复查询只请求一次，单个查询失败不影响整批"""
+        # 记录每个唯一查询首次出现的位置，以及每个查询对应的唯一查询序号
+        first_index: Dict[bytes, int] = {}
+        slots = []
+        unique_inquiries = []
         for inquiry in inquiries:
-            result = self.process_customer_inquiry(inquiry['question'], inquiry['user_info'])
-            results.append(result)
+            key = self._inquiry_key(inquiry)
+            if key not in first_index:
+                first_index[key] = len(unique_inquiries)
+                unique_inquiries.append(inquiry)
+            slots.append(first_index[key])
+
+        logger.info(
+            f"开始批处理{len(inquiries)}个查询（去重后{len(unique_inquiries)}个），并发上限{max_concurrency}"
+        )
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run_one(inquiry: Dict) -> Dict:
+            async with semaphore:
+                return await self.aprocess_customer_inquiry(inquiry['question'], inquiry['user_info'])
+
+        outcomes = await asyncio.gather(
+            *(run_one(inquiry) for inquiry in unique_inquiries), return_exceptions=True
+        )
+        unique_results = [
+            self._error_response(outcome, 0.0) if isinstance(outcome, BaseException) else outcome
+            for outcome in outcomes
+        ]
+        # 按原始顺序回填结果，重复查询各自持有一份副本
+        results = [dict(unique_results[slot]) for slot in slots]
         logger.info(f"批处理完成，共处理{len(results)}个查询")
         return results
 
+    def batch_process_inquiries(self, inquiries:List[Dict]) -> List[Dict]:
+        """批处理查询（同步入口）"""
+        return asyncio.run(self.abatch_process_inquiries(inquiries))
+
     def get_performance_stats(self) -> Dict:
         """获取性能统计"""
-        stats = self.performance_stats.copy()
+        stats = asdict(self.performance_stats)
+        stats["average_response_time"] = round(stats["average_response_time"], 2)
         if stats["total_requests"] > 0:
             stats["success_rate"] = round(
                 (stats["successful_requests"] / stats["total_requests"]) * 100, 2
@@ -6,24 +6,31 @@ LastEditTime: 2025-12-05 14:12:48
 FilePath: /RAG_service/chain/dashscope_embedding.py
 Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查看配置 进行设置: https://github.com/OBKoro1/koro1FileHeader/wiki/%E9%85%8D%E7%BD%AE
 '''
-from langchain_community.vectorstores import Chroma
+import sys
+import os
+
+# 添加项目根目录到Python路径，直接以脚本运行时也能导入 chain 包
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from langchain_community.embeddings import DashScopeEmbeddings
 # from langchain.chains import LLMRouterChain, MultiPromptChain
 from langchain_core.language_models import BaseLLM
 from langchain_core.prompts import PromptTemplate
-from langchain_community.llms import Tongyi
+from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
-import os
+from chain._http import create_dashscope_chat
+from functools import lru_cache
+import numpy as np
 load_dotenv()
 
+ROUTER_CACHE_SIZE = 4096
+
 # 1. 定义任务名称与描述
 names_and_descriptions = [
     ("physics", ["用于解答物理相关问题，例如力学、电磁学等"]), 
     ("math", ["用于解答数学相关问题，例如代数、几何、微积分等"]), 
 ]
 
-embedding = DashScopeEmbeddings(model="text-embedding-v2")
-
 descriptions = []
 
 names = []
@@ -32,15 +39,29 @@ for name, desc_list in names_and_descriptions:
         descriptions.append(desc)
         names.append(name)
 
-vectorstore = Chroma(embedding_function=embedding)
+def _normalize(vector) -> np.ndarray:
+    vec = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vec, axis=-1, keepdims=True)
+    return vec / np.where(norm > 0, norm, 1.0)
+
+names = np.asarray(names)
+
+@lru_cache(maxsize=1)
+def get_embedding() -> DashScopeEmbeddings:
+    return DashScopeEmbeddings(model="text-embedding-v2")
 
-vectorstore.add_texts(texts=descriptions, metadatas=[{"name":name} for name in names])
+@lru_cache(maxsize=1)
+def get_description_embeddings() -> np.ndarray:
+    """路由描述只有少量静态条目，首次路由时一次性向量化并归一化，之后查询一次矩阵乘即可；导入模块时不发起请求"""
+    return _normalize(get_embedding().embed_documents(descriptions))
 
+@lru_cache(maxsize=ROUTER_CACHE_SIZE)
 def get_relevant_chain_name(question:str) -> str:
-    docs = vectorstore.similarity_search(question, k=1)
-    return docs[0].metadata["name"]
+    """问题路由：选择与问题余弦相似度最高的任务描述"""
+    q_emb = _normalize(get_embedding().embed_query(question))
+    return str(names[int(np.argmax(get_description_embeddings() @ q_emb))])
 
-llm = Tongyi(model_name="qwen-plus",temperature=1)
+llm = create_dashscope_chat("qwen-plus", temperature=1) | StrOutputParser()
 
 physics_prompt = PromptTemplate(
     template="你是一个物理专家，请回答以下问题：\n{input}",
@@ -66,5 +87,6 @@ def run_router_chain(question:str) -> str:
     else:
         return default_chain(question)
 
-result = run_router_chain("牛顿第一定律是什么？")
-print(result)
\ No newline at end of file
+if __name__ == "__main__":
+    result = run_router_chain("牛顿第一定律是什么？")
+    print(result)
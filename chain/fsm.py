@@ -6,16 +6,23 @@ LastEditTime: 2025-12-08 21:33:45
 FilePath: /RAG_service/chain/fsm.py
 Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查看配置 进行设置: https://github.com/OBKoro1/koro1FileHeader/wiki/%E9%85%8D%E7%BD%AE
 '''
-from langchain_community.llms import Tongyi
-from langchain_core.prompts import PromptTemplate
+from langchain_community.chat_models import ChatTongyi
+from langchain_core.messages import SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from enum import Enum
-from typing import Dict, List ,Any , Optional
-import json
+from types import MappingProxyType
+import asyncio
+import logging
+from functools import lru_cache, wraps
+from typing import Dict, List ,Any , Optional, Tuple
+import orjson
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class OrderState(Enum):
     START = "开始"
     ORDER_VALIDATED = "订单已验证"
@@ -25,110 +32,245 @@ class OrderState(Enum):
     END = "结束"
     ERROR = "错误"
 
+# 各节点的确认消息模板（*_MESSAGE 为不含变量的固定消息，直接使用，不请求 LLM）
+VALIDATE_TEMPLATE = "订单验证成功！订单号: {order_number}, 客户: {customer}, 商品: {product}, 金额: {amount}元"
+PAYMENT_PAID_MESSAGE = "付款状态检查完成：订单已付款，可以直接开具发票"
+PAYMENT_UNPAID_MESSAGE = "付款状态检查完成：订单未付款，需要先处理付款"
+PROCESS_PAYMENT_TEMPLATE = '付款处理完成！付款金额: {amount}元，付款方式: {payment_method}，交易号: TXN{order_number}-2024'
+INVOICE_TEMPLATE = "发票开具完成！发票号: {invoice_number}，金额: {amount}元，类型: {invoice_type}"
+END_MESSAGE = '订单处理流程已完成，所有步骤执行成功'
+
+MessageRequest = Tuple[str, Dict[str, Any]]
+
+# Mock 订单数据：只读参考数据，模块加载时构建一次
+_ORDERS_RAW = {
+    "ORD001": {
+        "customer": "张三",
+        "product": "iPhone 15", 
+        "amount": 7999,
+        "date": "2024-01-10",
+        "payment_status": "未付款"
+    },
+    "ORD002": {
+        "customer": "李四",
+        "product": "MacBook Pro",
+        "amount": 15999, 
+        "date": "2024-01-08",
+        "payment_status": "未付款"
+    },
+    "ORD003": {
+        "customer": "王五",
+        "product": "iPad Air",
+        "amount": 4999,
+        "date": "2024-01-12", 
+        "payment_status": "已付款"
+    }
+}
+_ORDERS = MappingProxyType({
+    order_number: MappingProxyType(order_info) for order_number, order_info in _ORDERS_RAW.items()
+})
+
+# 固定的说明放在最前面作为公共前缀，动态数据放在末尾，便于服务端前缀缓存命中
+MESSAGE_SYSTEM_PROMPT = "你是订单处理助手，请根据用户给出的动态数据，用专业简洁的语气生成一条确认消息。"
+MESSAGE_PROMPT = ChatPromptTemplate.from_messages([
+    SystemMessage(content=MESSAGE_SYSTEM_PROMPT),
+    ("human", "----\n动态数据:\n{content}")
+])
+
+# 输出解析器无状态，全模块共用一个实例
+_STR_PARSER = StrOutputParser()
+
+# 状态转移表：当前状态 -> (执行的节点, 步骤说明)
+TRANSITIONS: Dict[OrderState, Tuple[str, str]] = {
+    OrderState.START: ("validate_order", "步骤1: 验证订单"),
+    OrderState.ORDER_VALIDATED: ("check_payment", "步骤2: 检查付款状态"),
+    OrderState.PAYMENT_CHECKED: ("process_payment", "步骤3: 处理付款"),
+    OrderState.PAYMENT_PROCESSED: ("generate_invoice", "步骤4: 开具发票"),
+    OrderState.INVOICE_GENERATED: ("end", "步骤5: 结束流程"),
+}
+
+def _requires_state(expected: OrderState, error_template: str):
+    """节点前置状态校验：当前状态不符时直接返回错误结果，不执行节点"""
+    # 各状态对应的错误消息在定义节点时一次性生成，运行时直接查表
+    errors = {state: error_template.format(state=state.value) for state in OrderState}
+
+    def decorator(node):
+        @wraps(node)
+        def wrapper(self, *args, **kwargs):
+            logger.debug("  执行节点: %s", node.__name__)
+            logger.debug("  当前状态: %s", self.current_state.value)
+            if self.current_state is not expected:
+                return {
+                    "success": False,
+                    "message": errors[self.current_state],
+                    'next_state': OrderState.ERROR
+                }
+            return node(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def _json_default(obj):
+    """orjson 不直接支持 MappingProxyType（只读订单数据），转换为普通字典"""
+    if isinstance(obj, MappingProxyType):
+        return dict(obj)
+    raise TypeError
+
+def _new_history() -> Dict[str, List[str]]:
+    """状态转换历史按字段分列存储，每个字段一个列表，同一下标对应同一次转换"""
+    return {'from': [], 'to': [], 'action': [], 'result': []}
+
+@lru_cache(maxsize=1)
+def _get_llm() -> Optional[ChatTongyi]:
+    """进程内共享的 LLM 客户端，首次使用时创建；创建失败时返回 None 并退回模板消息"""
+    try:
+        return ChatTongyi(
+            temperature=0,
+            model_name="qwen-plus",
+            # dashscope_api_key=os.getenv("DASHSCOPE_API_KEY")
+        )
+    except Exception as e:
+        logger.error("初始化LLM时出错: %s", e)
+        return None
+
+@lru_cache(maxsize=1)
+def _get_message_chain():
+    """消息生成链只依赖共享的 LLM，同样只构建一次"""
+    llm = _get_llm()
+    if llm is None:
+        return None
+    return MESSAGE_PROMPT | llm | _STR_PARSER
+
 class OrderProcessGraph:
     def __init__(self):
         self.current_state = OrderState.START
         self.context = {}
-        self.history = []
-
-        # Mock 数据
-        self.orders = {
-            "ORD001": {
-                "customer": "张三",
-                "product": "iPhone 15", 
-                "amount": 7999,
-                "date": "2024-01-10",
-                "payment_status": "未付款"
-            },
-            "ORD002": {
-                "customer": "李四",
-                "product": "MacBook Pro",
-                "amount": 15999, 
-                "date": "2024-01-08",
-                "payment_status": "未付款"
-            },
-            "ORD003": {
-                "customer": "王五",
-                "product": "iPad Air",
-                "amount": 4999,
-                "date": "2024-01-12", 
-                "payment_status": "已付款"
-            }
-        }
+        self.history = _new_history()
 
-        self.llm = None
-        try:
-            self.llm = Tongyi(
-                temperature=0,
-                model_name="gwen-plus",
-                # dashscope_api_key=os.getenv("DASHSCOPE_API_KEY")
-            )
-        except Exception as e:
-            print(f"初始化LLM时出错: {e}")
+        # Mock 数据（只读，所有实例共享）
+        self.orders = _ORDERS
+
+        self.llm = _get_llm()
+        self.message_chain = _get_message_chain()
 
     def add_to_history(self,from_state:OrderState,to_state:OrderState,action: str, result: str):
-        self.history.append({
-            'from': from_state.value,
-            'to': to_state.value,
-            'action': action,
-            'result': result
-        })
+        history = self.history
+        history['from'].append(from_state.value)
+        history['to'].append(to_state.value)
+        history['action'].append(action)
+        history['result'].append(result)
 
     def generate_message_with_llm(self, template_str: str, variables:Dict) -> str:
-        if not self.llm:
-            return template_str.format(**variables)
+        return self.generate_messages_with_llm([(template_str, variables)])[0]
+
+    def generate_messages_with_llm(self, requests: List[MessageRequest]) -> List[str]:
+        """批量生成确认消息：模板先填充变量，再通过一次 chain.batch 并发请求 LLM"""
+        rendered = [template_str.format_map(variables) for template_str, variables in requests]
+        dynamic = self._dynamic_indices(requests)
+        if not self.message_chain or not dynamic:
+            return rendered
 
         try:
-            prompt = PromptTemplate.from_template(template_str + " 请生成一个专业简洁的确认消息。")
-            chain = prompt | self.llm | StrOutputParser()
-            return chain.invoke(variables)
+            generated = self.message_chain.batch([{"content": rendered[i]} for i in dynamic])
         except Exception as e:
-            print(f"LLM调用出错: {e}")
-            return template_str.format(**variables)
+            logger.warning("LLM调用出错: %s", e)
+            return rendered
+        for i, message in zip(dynamic, generated):
+            rendered[i] = message
+        return rendered
+
+    @staticmethod
+    def _dynamic_indices(requests: List[MessageRequest]) -> List[int]:
+        """需要 LLM 润色的请求下标；不含变量的固定模板直接作为消息返回"""
+        return [
+            i for i, (template_str, variables) in enumerate(requests)
+            if variables or "{" in template_str
+        ]
+
+    @staticmethod
+    def _validate_request(order_number: str, order_info: Dict) -> MessageRequest:
+        return VALIDATE_TEMPLATE, {
+            'order_number': order_number,
+            'customer': order_info['customer'],
+            'product': order_info['product'],
+            'amount': order_info['amount']
+        }
 
-    def validate_order_node(self,order_number:str) -> Dict[str, Any]:
-        """验证订单节点"""
-        print(f"  执行节点: validate_order_node")
-        print(f"  当前状态: {self.current_state.value}")
+    @staticmethod
+    def _process_payment_request(order_number: str, amount, payment_method: str) -> MessageRequest:
+        return PROCESS_PAYMENT_TEMPLATE, {
+            "amount": amount,
+            "payment_method": payment_method,
+            "order_number": order_number
+        }
 
-        if self.current_state != OrderState.START:
-            message = f"错误：当前状态为{self.current_state.value},无法验证订单"
-            return {
-                "success": False,
-                "message": message,
-                'next_state': OrderState.ERROR
-            }
-        if order_number in self.orders:
-            order_info = self.orders[order_number]
-            self.context.update({
-                "order_number": order_number,
-                "order_info": order_info
-            })
-
-            # 使用LangChain 生成消息
-            template = "订单验证成功！订单号: {order_number}, 客户: {customer}, 商品: {product}, 金额: {amount}元"
-            message = self.generate_message_with_llm(template,{
-                'order_number': order_number,
-                'customer': order_info['customer'],
-                'product': order_info['product'],
-                'amount': order_info['amount']
-            })
-
-            self.add_to_history(
-                self.current_state,
-                OrderState.ORDER_VALIDATED,
-                "验证订单",
-                message
-            )
+    @staticmethod
+    def _invoice_request(order_number: str, amount, invoice_type: str) -> MessageRequest:
+        return INVOICE_TEMPLATE, {
+            "invoice_number": f"INV{order_number}-2024",
+            "amount": amount,
+            "invoice_type": invoice_type
+        }
 
-            self.current_state = OrderState.ORDER_VALIDATED
+    def plan_messages(self, order_number: str, payment_method: str, invoice_type: str) -> Dict[str, MessageRequest]:
+        """根据订单信息预先确定流程中每个节点需要生成的消息，订单不存在时返回空字典"""
+        order_info = self.orders.get(order_number)
+        if order_info is None:
+            return {}
 
-            return {
-                "success": True,
-                "message": message,
-                'next_state': OrderState.ORDER_VALIDATED
-            }
-        else:
+        payment_status = order_info.get('payment_status', '未付款')
+        amount = order_info.get("amount", 0)
+        # 付款检查与结束节点的消息是固定文本，由节点直接使用，无需请求 LLM
+        plan = {"validate_order": self._validate_request(order_number, order_info)}
+        if payment_status != '已付款':
+            plan["process_payment"] = self._process_payment_request(order_number, amount, payment_method)
+        plan["generate_invoice"] = self._invoice_request(order_number, amount, invoice_type)
+        return plan
+
+    async def agenerate_messages_with_llm(self, requests: List[MessageRequest]) -> List[str]:
+        """异步批量生成确认消息，各条消息并发请求，不阻塞事件循环"""
+        rendered = [template_str.format_map(variables) for template_str, variables in requests]
+        dynamic = self._dynamic_indices(requests)
+        if not self.message_chain or not dynamic:
+            return rendered
+
+        try:
+            generated = await asyncio.gather(
+                *(self.message_chain.ainvoke({"content": rendered[i]}) for i in dynamic)
+            )
+        except Exception as e:
+            logger.warning("LLM调用出错: %s", e)
+            return rendered
+        for i, message in zip(dynamic, generated):
+            rendered[i] = message
+        return rendered
+
+    async def aprecompute_messages(self, order_number: str, payment_method: str, invoice_type: str) -> Dict[str, str]:
+        """异步版本的 precompute_messages"""
+        plan = self.plan_messages(order_number, payment_method, invoice_type)
+        messages = await self.agenerate_messages_with_llm(list(plan.values()))
+        return dict(zip(plan.keys(), messages))
+
+    def precompute_messages(self, order_number: str, payment_method: str, invoice_type: str) -> Dict[str, str]:
+        """一次批量调用生成整个流程的确认消息"""
+        plan = self.plan_messages(order_number, payment_method, invoice_type)
+        messages = self.generate_messages_with_llm(list(plan.values()))
+        return dict(zip(plan.keys(), messages))
+
+    def _transition(self, next_state: OrderState, action: str, message: str, **extra: Any) -> Dict[str, Any]:
+        """记录状态转换并返回成功结果"""
+        self.add_to_history(self.current_state, next_state, action, message)
+        self.current_state = next_state
+        return {
+            "success": True,
+            "message": message,
+            'next_state': next_state,
+            **extra
+        }
+
+    @_requires_state(OrderState.START, "错误：当前状态为{state},无法验证订单")
+    def validate_order_node(self,order_number:str, message: Optional[str] = None) -> Dict[str, Any]:
+        """验证订单节点"""
+        if order_number not in self.orders:
             message = f"订单号 {order_number} 不存在"
             self.add_to_history(self.current_state, OrderState.ERROR, "验证订单", message)
             self.current_state = OrderState.ERROR
@@ -138,72 +280,46 @@ class OrderProcessGraph:
                 'next_state': OrderState.ERROR
             }
 
-    def check_payment_node(self) -> Dict[str,Any]:
-        """检查付款节点"""
-        print(f"当前节点: check_payment_node")
-        print(f"当前状态:{self.current_state.value}")
+        order_info = self.orders[order_number]
+        self.context.update({
+            "order_number": order_number,
+            "order_info": order_info
+        })
 
-        if self.current_state != OrderState.ORDER_VALIDATED:
-            message = f"错误：当前节点为{self.current_state.value}，无法进行付款操作"
-            return {
-                "success": false,
-                "message": message,
-                'next_state':OrderState.ERROR
-            }
-        
+        # 使用LangChain 生成消息（已预先批量生成时直接使用）
+        if message is None:
+            message = self.generate_message_with_llm(*self._validate_request(order_number, order_info))
+
+        return self._transition(OrderState.ORDER_VALIDATED, "验证订单", message)
+
+    @_requires_state(OrderState.ORDER_VALIDATED, "错误：当前节点为{state}，无法进行付款操作")
+    def check_payment_node(self, message: Optional[str] = None) -> Dict[str,Any]:
+        """检查付款节点"""
         order_info = self.context.get("order_info",{})
         payment_status = order_info.get('payment_status', '未付款')
-        
+
         if payment_status == '已付款':
-            template = "付款状态检查完成：订单已付款，可以直接开具发票"
-            message = self.generate_message_with_llm(template, {})
+            message = message or PAYMENT_PAID_MESSAGE
             self.context['payment_confirmed'] = True
             next_state = OrderState.PAYMENT_PROCESSED
         else:
-            template = "付款状态检查完成：订单未付款，需要先处理付款"
-            message = self.generate_message_with_llm(template, {})
+            message = message or PAYMENT_UNPAID_MESSAGE
             self.context['payment_confirmed'] = False
             next_state = OrderState.PAYMENT_CHECKED
 
-        self.add_to_history(
-            self.current_state,
-            next_state,
-            "检查付款状态",
-            message
-        )
-        self.current_state = next_state
-
-        return {
-            'success': True,
-            'message': message,
-            'next_state': next_state,
-            'payment_status': payment_status
-        }
+        return self._transition(next_state, "检查付款状态", message, payment_status=payment_status)
 
-    def process_payment_node(self, payment_method: str = "支付宝") -> Dict[str, Any]:
+    @_requires_state(OrderState.PAYMENT_CHECKED, "错误：当前状态为 {state}，无法处理付款")
+    def process_payment_node(self, payment_method: str = "支付宝", message: Optional[str] = None) -> Dict[str, Any]:
         """处理付款节点"""
-        print(f"当前节点: process_payment_node")
-        print(f"当前状态:{self.current_state.value}")
-
-        if self.current_state != OrderState.PAYMENT_CHECKED:
-            message = f"错误：当前状态为 {self.current_state.value}，无法处理付款"
-            return {
-                'success': False,
-                'message': message,
-                'next_state': OrderState.ERROR
-            }
-
         order_info = self.context.get("order_info",{})
         amount = order_info.get("amount", 0)
         order_number = self.context.get("order_number", "000")
 
-        template = '付款处理完成！付款金额: {amount}元，付款方式: {payment_method}，交易号: TXN{order_number}-2024'
-
-        message = self.generate_message_with_llm(template,{
-            "amount": amount,
-            "payment_method": payment_method,
-            "order_number": order_number
-        })
+        if message is None:
+            message = self.generate_message_with_llm(
+                *self._process_payment_request(order_number, amount, payment_method)
+            )
 
         self.context.update({
             'payment_amount': amount,
@@ -212,41 +328,20 @@ class OrderProcessGraph:
             'payment_confirmed': True
         })
 
-        self.add_to_history(self.current_state,OrderState.PAYMENT_PROCESSED,"处理付款", message)
-
-        self.current_state = OrderState.PAYMENT_PROCESSED
+        return self._transition(OrderState.PAYMENT_PROCESSED, "处理付款", message)
 
-        return {
-            "success": True,
-            "message": message,
-            'next_state': OrderState.PAYMENT_PROCESSED
-        }
-
-    def generate_invoice_node(self, invoice_type:str = "电子发票") -> Dict[str, Any]:
+    @_requires_state(OrderState.PAYMENT_PROCESSED, "错误：当前状态为 {state}，无法开具发票。必须先完成付款处理")
+    def generate_invoice_node(self, invoice_type:str = "电子发票", message: Optional[str] = None) -> Dict[str, Any]:
         """开局发票节点"""
-        print(f"当前节点: generate_invoice_node")
-        print(f"当前状态:{self.current_state.value}")
-
-        if self.current_state != OrderState.PAYMENT_PROCESSED:
-            message = f"错误：当前状态为 {self.current_state.value}，无法开具发票。必须先完成付款处理"
-            return {
-                'success': False,
-                'message': message,
-                'next_state': OrderState.ERROR
-            }
-
         order_info = self.context.get("order_info",{})
         amount = order_info.get("amount", 0)
         order_number = self.context.get("order_number", "000")
         invoice_number = f"INV{order_number}-2024"
 
-        template = "发票开具完成！发票号: {invoice_number}，金额: {amount}元，类型: {invoice_type}"
-
-        message = self.generate_message_with_llm(template,{
-            "invoice_number": invoice_number,
-            "amount": amount,
-            "invoice_type": invoice_type
-        })
+        if message is None:
+            message = self.generate_message_with_llm(
+                *self._invoice_request(order_number, amount, invoice_type)
+            )
 
         self.context.update({
             'invoice_number': invoice_number,
@@ -255,42 +350,12 @@ class OrderProcessGraph:
             'invoice_status': '已开具'
         })
 
-        self.add_to_history(self.current_state, OrderState.INVOICE_GENERATED,'开具发票', message)
+        return self._transition(OrderState.INVOICE_GENERATED, '开具发票', message)
 
-        self.current_state = OrderState.INVOICE_GENERATED
-
-        return {
-            "success": True,
-            "message": message,
-            'next_state': OrderState.INVOICE_GENERATED
-        }
-
-    def end_node(self) -> Dict[str,Any]:
+    @_requires_state(OrderState.INVOICE_GENERATED, "错误：当前状态为{state}, 流程未完成")
+    def end_node(self, message: Optional[str] = None) -> Dict[str,Any]:
         """结束节点"""
-        print(f"  执行节点: end_node")
-        print(f"  当前状态:{self.current_state.value}")
-
-        if self.current_state != OrderState.INVOICE_GENERATED:
-            message = f"错误：当前状态为{self.current_state.value}, 流程未完成"
-            return {
-                'success': False,
-                'message': message,
-                'next_state': OrderState.ERROR
-            }
-
-        template = '订单处理流程已完成，所有步骤执行成功'
-
-        message = self.generate_message_with_llm(template, {})
-
-        self.add_to_history(self.current_state, OrderState.END, '结束节点', message)
-
-        self.current_state = OrderState.END
-
-        return {
-            "success": True,
-            "message": message,
-            'next_state': OrderState.END
-        }
+        return self._transition(OrderState.END, '结束节点', message or END_MESSAGE)
 
     def should_process_payment(self) -> bool:
         """判断是否需要处理付款"""
@@ -298,24 +363,29 @@ class OrderProcessGraph:
 
     def get_status(self) -> str:
         """获取当前状态"""
-        """获取当前状态"""
+        context_json = orjson.dumps(self.context, default=_json_default, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
         result = f"""
 当前状态: {self.current_state.value}
-流程上下文: {json.dumps(self.context, ensure_ascii=False, indent=2)}
+流程上下文: {context_json}
 """
-        
-        if self.history:
-            result += f"\n状态转换历史:\n"
-            for i, step in enumerate[Any](self.history, 1):
-                result += f"  {i}. {step['from']} → {step['to']} ({step['action']})\n"
-        
+
+        if self.history['from']:
+            history = self.history
+            lines = [
+                f"  {i}. {from_state} → {to_state} ({action})"
+                for i, (from_state, to_state, action) in enumerate(
+                    zip(history['from'], history['to'], history['action']), 1
+                )
+            ]
+            result += "\n状态转换历史:\n" + "\n".join(lines) + "\n"
+
         return result
 
     def reset(self):
         """重置状态机"""
         self.current_state = OrderState.START
         self.context = {}
-        self.history = []
+        self.history = _new_history()
 
 class OrderProcessExecutor:
     def __init__(self):
@@ -323,55 +393,71 @@ class OrderProcessExecutor:
 
     def execute_workflow(self, order_number: str, payment_method: str = "支付宝", invoice_type: str = "电子发票"):
         """执行完整的工作流程"""
-        print(f"=== 开始处理订单 {order_number} ===\n")
-        
-        # 步骤1: 验证订单
-        print("步骤1: 验证订单")
-        result1 = self.graph.validate_order_node(order_number)
-        print(f"结果: {result1['message']}")
-        print(f"状态转换: {self.graph.current_state.value}\n")
-        
-        if not result1['success']:
-            return result1
-        
-        # 步骤2: 检查付款状态
-        print("步骤2: 检查付款状态")
-        result2 = self.graph.check_payment_node()
-        print(f"结果: {result2['message']}")
-        print(f"状态转换: {self.graph.current_state.value}\n")
-        
-        if not result2['success']:
-            return result2
-        
-        # 条件分支：如果未付款，则处理付款
-        if self.graph.should_process_payment():
-            print("步骤3: 处理付款")
-            result3 = self.graph.process_payment_node(payment_method)
-            print(f"结果: {result3['message']}")
-            print(f"状态转换: {self.graph.current_state.value}\n")
-            
-            if not result3['success']:
-                return result3
-        else:
-            print("步骤3: 跳过付款处理（订单已付款）")
-            print(f"当前状态保持: {self.graph.current_state.value}\n")
-        
-        # 步骤4: 开具发票
-        print("步骤4: 开具发票")
-        result4 = self.graph.generate_invoice_node(invoice_type)
-        print(f"结果: {result4['message']}")
-        print(f"状态转换: {self.graph.current_state.value}\n")
-        
-        if not result4['success']:
-            return result4
-        
-        # 步骤5: 结束流程
-        print("步骤5: 结束流程")
-        result5 = self.graph.end_node()
-        print(f"结果: {result5['message']}")
-        print(f"状态转换: {self.graph.current_state.value}\n")
-        
-        return result5
+        logger.info("=== 开始处理订单 %s ===", order_number)
+
+        # 各节点的消息只依赖订单信息，流程开始前一次性批量生成
+        messages = self.graph.precompute_messages(order_number, payment_method, invoice_type)
+        return self._run_steps(order_number, payment_method, invoice_type, messages)
+
+    async def aexecute_workflow(self, order_number: str, payment_method: str = "支付宝", invoice_type: str = "电子发票"):
+        """异步执行完整的工作流程，各节点消息并发生成"""
+        logger.info("=== 开始处理订单 %s ===", order_number)
+
+        messages = await self.graph.aprecompute_messages(order_number, payment_method, invoice_type)
+        return self._run_steps(order_number, payment_method, invoice_type, messages)
+
+    def execute_batch(
+        self, order_numbers: List[str], payment_method: str = "支付宝", invoice_type: str = "电子发票"
+    ) -> List[Dict[str, Any]]:
+        """批量处理多个订单：所有订单的消息合并为一次 chain.batch 调用，再逐个执行状态转换"""
+        graphs = [OrderProcessGraph() for _ in order_numbers]
+        plans = [
+            graph.plan_messages(order_number, payment_method, invoice_type)
+            for graph, order_number in zip(graphs, order_numbers)
+        ]
+        flat_requests = [request for plan in plans for request in plan.values()]
+        flat_messages = iter(self.graph.generate_messages_with_llm(flat_requests))
+
+        results = []
+        for graph, order_number, plan in zip(graphs, order_numbers, plans):
+            messages = {node_name: next(flat_messages) for node_name in plan}
+            results.append(self._run_steps(order_number, payment_method, invoice_type, messages, graph))
+        return results
+
+    def _run_steps(
+        self, order_number: str, payment_method: str, invoice_type: str, messages: Dict[str, str],
+        graph: Optional[OrderProcessGraph] = None
+    ):
+        """按状态转移表依次执行各节点，消息已预先生成"""
+        graph = graph or self.graph
+        nodes = {
+            "validate_order": lambda: graph.validate_order_node(order_number, messages.get("validate_order")),
+            "check_payment": lambda: graph.check_payment_node(messages.get("check_payment")),
+            "process_payment": lambda: graph.process_payment_node(payment_method, messages.get("process_payment")),
+            "generate_invoice": lambda: graph.generate_invoice_node(invoice_type, messages.get("generate_invoice")),
+            "end": lambda: graph.end_node(messages.get("end")),
+        }
+
+        result = None
+        while graph.current_state is not OrderState.END:
+            transition = TRANSITIONS.get(graph.current_state)
+            if transition is None:
+                break
+            node_name, label = transition
+            logger.info(label)
+            result = nodes[node_name]()
+            logger.info("结果: %s", result['message'])
+            logger.info("状态转换: %s", graph.current_state.value)
+
+            if not result['success']:
+                return result
+
+            # 已付款订单由检查节点直接转移到付款完成状态
+            if node_name == "check_payment" and not graph.should_process_payment():
+                logger.info("步骤3: 跳过付款处理（订单已付款）")
+                logger.info("当前状态保持: %s", graph.current_state.value)
+
+        return result
 
     def get_status(self):
         return self.graph.get_status()
@@ -403,4 +489,5 @@ def demo_fsm_langchain_complete():
     print("="*80 + "\n")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     demo_fsm_langchain_complete()
\ No newline at end of file
@@ -1,12 +1,18 @@
-from typing import Annotated
+import sys
 import os
+
+# 添加项目根目录到Python路径，直接以脚本运行时也能导入 chain 包
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import asyncio
+from typing import Annotated
 from langchain_core.messages import convert_to_messages
 from langchain_core.tools import tool, InjectedToolCallId
 from langgraph.prebuilt import InjectedState
 from langchain.agents import create_agent
 from langgraph.graph import StateGraph, START,MessagesState
 from langgraph.types import Command
-from langchain_community.chat_models import ChatTongyi
+from chain._http import create_dashscope_chat
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -107,11 +113,8 @@ def book_flight(from_airport:str, to_airport:str):
     """模拟预订机票的操作"""
     return f"已成功预订从{from_airport}到{to_airport}的航班"
 
-chat_llm = ChatTongyi(
-    model="qwen-plus",
-    # base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-)
+# 两个助理共用同一个模型实例，请求走共享的 keep-alive 连接池
+chat_llm = create_dashscope_chat("qwen-plus")
 
 flight_assistant = create_agent(
     model=chat_llm,
@@ -135,14 +138,19 @@ multi_agent_graph = (
     .compile()
 )
 
-for chunk in multi_agent_graph.stream(
-    {
-        "messages": [
-            {
-                "role":"user",
-                "content":"请帮我预订一张从波士顿(BOS)到纽约(JFK)的机票，以及在麦克基特里克酒店(McKittrick Hotel)的住宿"
-            }
-        ]
-    }
-):
-    pretty_print_messages(chunk)
\ No newline at end of file
+async def main():
+    async for chunk in multi_agent_graph.astream(
+        {
+            "messages": [
+                {
+                    "role":"user",
+                    "content":"请帮我预订一张从波士顿(BOS)到纽约(JFK)的机票，以及在麦克基特里克酒店(McKittrick Hotel)的住宿"
+                }
+            ]
+        },
+        stream_mode="updates",
+    ):
+        pretty_print_messages(chunk)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+'''
+Description: LLM 语义缓存：上下文完全相同、最后一条用户消息语义相近时直接复用已有生成结果
+'''
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import faiss
+import numpy as np
+import orjson
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.embeddings import Embeddings
+
+SIMILARITY_THRESHOLD = 0.95
+# 语义索引最多保留的上下文数，超出时淘汰最久未使用的上下文
+MAX_CONTEXTS = 1024
+# 每个上下文最多缓存的生成结果数，写满后不再追加
+MAX_ENTRIES_PER_CONTEXT = 256
+# lookup 未命中时暂存的向量数；生成失败时不会有对应的 update，按最久未使用淘汰
+MAX_PENDING_VECTORS = 256
+
+logger = logging.getLogger(__name__)
+
+
+def _split_prompt(prompt: str, llm_string: str) -> Tuple[str, Optional[str]]:
+    """拆分为 (上下文键, 参与语义匹配的文本)。
+    聊天模型的 prompt 是序列化的消息列表：最后一条人类消息做语义匹配，其余消息与模型参数必须完全一致；
+    纯文本 prompt（如 ReAct 模板，问题和中间步骤混在整段文本里）返回 None，只做精确匹配
+    """
+    try:
+        messages = orjson.loads(prompt)
+    except orjson.JSONDecodeError:
+        return "", None
+    if not (isinstance(messages, list) and messages and isinstance(messages[-1], dict)):
+        return "", None
+    last = messages[-1].get("kwargs") or {}
+    if last.get("type") != "human" or not isinstance(last.get("content"), str):
+        return "", None
+    context = orjson.dumps([llm_string, messages[:-1]], option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha1(context).hexdigest(), last["content"]
+
+
+class SemanticLLMCache(BaseCache):
+    """两级 LLM 缓存：先查精确缓存（可持久化，如 SQLiteCache），未命中再按最后一条用户消息的
+    向量相似度查找，相似度不低于阈值时复用结果。语义索引按上下文键分组，保存在内存中，
+    上下文数与每个上下文的结果数都有上限
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        exact_cache: Optional[BaseCache] = None,
+        threshold: float = SIMILARITY_THRESHOLD
+    ):
+        self.embeddings = embeddings
+        self.exact_cache = exact_cache
+        self.threshold = threshold
+        # 上下文键 -> (语义索引, 生成结果列表)，按最近使用排序
+        self._contexts: "OrderedDict[str, Tuple[faiss.IndexFlatIP, List[RETURN_VAL_TYPE]]]" = OrderedDict()
+        # 未命中时 lookup 已计算的向量，update 时直接复用，避免重复请求向量化接口；
+        # 以 (上下文键, 文本) 区分，同一问题在不同上下文下各自对应
+        self._pending_vectors: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        """计算归一化向量，失败时返回 None（跳过语义缓存）"""
+        try:
+            vector = np.asarray([self.embeddings.embed_query(text)], dtype="float32")
+        except Exception as e:
+            logger.warning("计算缓存向量失败：%s", e)
+            return None
+        faiss.normalize_L2(vector)
+        return vector
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if self.exact_cache is not None:
+            cached = self.exact_cache.lookup(prompt, llm_string)
+            if cached is not None:
+                return cached
+        key, text = _split_prompt(prompt, llm_string)
+        if text is None:
+            return None
+        with self._lock:
+            context = self._contexts.get(key)
+            if context is not None:
+                self._contexts.move_to_end(key)
+        if context is None:
+            return None
+        vector = self._embed(text)
+        if vector is None:
+            return None
+        index, values = context
+        with self._lock:
+            scores, ids = index.search(vector, 1)
+            if scores[0][0] >= self.threshold:
+                return values[ids[0][0]]
+            self._pending_vectors[(key, text)] = vector
+            if len(self._pending_vectors) > MAX_PENDING_VECTORS:
+                self._pending_vectors.popitem(last=False)
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if self.exact_cache is not None:
+            self.exact_cache.update(prompt, llm_string, return_val)
+        key, text = _split_prompt(prompt, llm_string)
+        if text is None:
+            return
+        with self._lock:
+            vector = self._pending_vectors.pop((key, text), None)
+        if vector is None:
+            vector = self._embed(text)
+            if vector is None:
+                return
+        with self._lock:
+            context = self._contexts.get(key)
+            if context is None:
+                context = self._contexts[key] = (faiss.IndexFlatIP(vector.shape[1]), [])
+                if len(self._contexts) > MAX_CONTEXTS:
+                    self._contexts.popitem(last=False)
+            else:
+                self._contexts.move_to_end(key)
+            index, values = context
+            if len(values) >= MAX_ENTRIES_PER_CONTEXT:
+                return
+            index.add(vector)
+            values.append(return_val)
+
+    def clear(self, **kwargs) -> None:
+        if self.exact_cache is not None:
+            self.exact_cache.clear(**kwargs)
+        with self._lock:
+            self._contexts.clear()
+            self._pending_vectors.clear()
@@ -1,18 +1,23 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Mapping, Optional
 from dataclasses import dataclass
+from types import MappingProxyType
 import json
 
-@dataclass
+@dataclass(frozen=True)
 class LLMConfig:
-    """LLM 配置数据类"""
+    """LLM 配置数据类（只读）"""
     name: str
     description: str
-    params: Dict[str, Any]
+    params: Mapping[str, Any]
+
+    def __post_init__(self):
+        # 参数表同样冻结，避免共享的预设被调用方意外修改
+        object.__setattr__(self, "params", MappingProxyType(dict(self.params)))
 
 
 # 预设配置模板
-PRESET_CONFIGS = {
-    "conservative": VLLMConfig(
+PRESET_CONFIGS: Mapping[str, LLMConfig] = MappingProxyType({
+    "conservative": LLMConfig(
         name="保守型",
         description="低随机性，适合需要准确性的任务",
         params={
@@ -24,7 +29,7 @@ PRESET_CONFIGS = {
         }
     ),
     
-    "balanced": VLLMConfig(
+    "balanced": LLMConfig(
         name="平衡型",
         description="平衡创意和准确性，适合大多数场景",
         params={
@@ -37,7 +42,7 @@ PRESET_CONFIGS = {
         }
     ),
     
-    "creative": VLLMConfig(
+    "creative": LLMConfig(
         name="创意型",
         description="高随机性，适合创意写作和头脑风暴",
         params={
@@ -50,7 +55,7 @@ PRESET_CONFIGS = {
         }
     ),
     
-    "precise": VLLMConfig(
+    "precise": LLMConfig(
         name="精确型",
         description="极低随机性，适合代码生成和技术文档",
         params={
@@ -63,7 +68,7 @@ PRESET_CONFIGS = {
         }
     ),
     
-    "diverse": VLLMConfig(
+    "diverse": LLMConfig(
         name="多样型",
         description="强调内容多样性，减少重复",
         params={
@@ -77,7 +82,7 @@ PRESET_CONFIGS = {
         }
     ),
     
-    "beam_search": VLLMConfig(
+    "beam_search": LLMConfig(
         name="束搜索型",
         description="使用束搜索，适合需要高质量输出的场景",
         params={
@@ -89,4 +94,4 @@ PRESET_CONFIGS = {
             "max_tokens": 1024
         }
     )
-}
+})
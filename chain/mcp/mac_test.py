@@ -6,6 +6,22 @@ LastEditTime: 2025-12-21 15:47:08
 FilePath: /RAG_service/chain/mcp/mac_test.py
 Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查看配置 进行设置: https://github.com/OBKoro1/koro1FileHeader/wiki/%E9%85%8D%E7%BD%AE
 '''
+import json
+import re
+from collections import deque
+
+import orjson
+
+# 对话历史上限：只保留最近的消息，避免每轮请求的预填充长度无限增长；
+# system 提示固定在历史之外，每次调用时放在最前面以保持前缀缓存命中
+MAX_HISTORY_MESSAGES = 32
+
+# 预编译工具调用解析正则，避免每次解析响应时重新查找/编译
+_TOOL_USE_RE = re.compile(
+    r"<tool_use>\s*<name>(.*?)</name>\s*<arguments>(.*?)</arguments>\s*</tool_use>",
+    re.DOTALL
+)
+
 # 基于 Function Calling 的实现
 
 LOGISTICS_TOOLS = [
@@ -94,8 +110,11 @@ def track_shipment(tracking_number):
     status = random.choice(statuses)
     return f"运单号 {tracking_number} 当前状态: {status}"
 
-messages = [{"role":"user","content":"从北京寄5kg包裹到上海，用顺丰快速要多少钱？"}]
-llm_output = call_llm(messages, tools=LOGISTICS_TOOLS)
+messages = deque(
+    [{"role":"user","content":"从北京寄5kg包裹到上海，用顺丰快速要多少钱？"}],
+    maxlen=MAX_HISTORY_MESSAGES
+)
+llm_output = call_llm(list(messages), tools=LOGISTICS_TOOLS)
 
 if llm_output.get("tool_calls"):
     tool_call = llm_output["tool_calls"][0]
@@ -116,17 +135,17 @@ messages.append({
     "tool_call_id": tool_call["id"]
 })
 
-final_response = call_llm(messages)
+final_response = call_llm(list(messages))
 
 
 # 查询物流公司
-messages = [{"role": "user", "content": "有哪些物流公司可以选择？"}]
+messages = deque([{"role": "user", "content": "有哪些物流公司可以选择？"}], maxlen=MAX_HISTORY_MESSAGES)
 
 # 查询配送时效  
-messages = [{"role": "user", "content": "从深圳到广州要几天能到？"}]
+messages = deque([{"role": "user", "content": "从深圳到广州要几天能到？"}], maxlen=MAX_HISTORY_MESSAGES)
 
 # 查询物流状态
-messages = [{"role": "user", "content": "帮我查一下运单号SF1234567890的状态"}]
+messages = deque([{"role": "user", "content": "帮我查一下运单号SF1234567890的状态"}], maxlen=MAX_HISTORY_MESSAGES)
 
 client = Client()
 await client.connect("mcp://logistics-service.com")
@@ -153,12 +172,13 @@ def build_mcp_prompt(tools):
     """
 
     system_prompt = build_mcp_tool_prompt(tools)
-    messages = [
-        {"role":"system","content":system_prompt},
-        {"role": "user", "content": "从北京寄5kg包裹到上海，用顺丰快递要多少钱？"}
-    ]
+    system_message = {"role":"system","content":system_prompt}
+    messages = deque(
+        [{"role": "user", "content": "从北京寄5kg包裹到上海，用顺丰快递要多少钱？"}],
+        maxlen=MAX_HISTORY_MESSAGES
+    )
 
-    assistant_response = await call_llm(messages)
+    assistant_response = await call_llm([system_message, *messages])
     
     tool_use = parse_tool_use(assistant_response)
     if tool_use:
@@ -172,25 +192,23 @@ def build_mcp_prompt(tools):
         "content": result,
         "tool_call_id": tool_use["id"]
     })
-    final_response = await call_llm(messages)
+    final_response = await call_llm([system_message, *messages])
 
 def parse_tool_use(response):
-    import re 
-    import json
-
-    match = re.search(
-        r"<tool_use>\s*<name>(.*?)</name>\s*<arguments>(.*?)</arguments>\s*</tool_use>",
-        response,
-        re.DOTALL
-    )
+    match = _TOOL_USE_RE.search(response)
     if match:
         name, args_str = match.groups()
+        args_str = args_str.strip()
         try:
-            arguments = json.loads(args_str.strip())
-            return {
-                "name": name.strip(),
-                "arguments": arguments
-            }
-        except json.JSONDecodeError:
-            return None
-    return None
\ No newline at end of file
+            arguments = orjson.loads(args_str)
+        except orjson.JSONDecodeError:
+            # orjson 不接受 NaN 等非标准 JSON，交给标准库再试一次
+            try:
+                arguments = json.loads(args_str)
+            except json.JSONDecodeError:
+                return None
+        return {
+            "name": name.strip(),
+            "arguments": arguments
+        }
+    return None
@@ -1,14 +1,23 @@
-import os 
+import sys
+import os
+
+# 添加项目根目录到Python路径，直接以脚本运行时也能导入 chain 包
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from openai import OpenAI
 from mem0 import Memory
 from mem0.configs.base import MemoryConfig
 from mem0.embeddings.configs import EmbedderConfig
 from mem0.llms.configs import LlmConfig 
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage,HumanMessage
+from langchain_community.cache import SQLiteCache
+from langchain_community.embeddings import DashScopeEmbeddings
+from langchain_core.messages import SystemMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from chain._http import DASHSCOPE_BASE_URL, create_dashscope_chat, get_sync_client
+from chain.memory.semantic_cache import SemanticCache, context_fingerprint
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,18 +25,66 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# LLM 响应缓存：相同的提示词与模型参数直接命中本地缓存，跳过 API 调用
+LLM_CACHE_PATH = os.getenv("EXPRESS_LLM_CACHE_PATH", ".express_llm.db")
+
+# 固定的系统提示放在请求最前面，每次请求的前缀字节完全一致，便于服务端前缀缓存命中；
+# 检索到的上下文和用户输入始终排在其后
+EXPRESS_SYSTEM_PROMPT = """您是一位专业的快递行业智能客服助手。请使用提供的上下文信息来个性化您的回复，记住用户的偏好和历史交互记录。
+
+                您的主要职责包括：
+                1. 快递查询服务：帮助用户查询包裹状态、物流轨迹、预计送达时间
+                2. 寄件服务：提供寄件指导、价格咨询、时效说明、包装建议
+                3. 问题解决：处理快递延误、丢失、损坏等问题，提供解决方案
+                4. 服务咨询：介绍各类快递服务、收费标准、服务范围
+                5. 投诉建议：接收用户反馈，记录投诉信息并提供处理方案
+
+                回复时请保持：
+                - 专业、礼貌、耐心的服务态度
+                - 准确、及时的信息提供
+                - 个性化的服务体验
+                - 如果没有具体信息，可以基于快递行业常识提供建议
+
+                请用中文回复，语气亲切专业。"""
+
+EXPRESS_PROMPT = ChatPromptTemplate.from_messages([
+    SystemMessage(content=[{
+        "type": "text",
+        "text": EXPRESS_SYSTEM_PROMPT,
+        "cache_control": {"type": "ephemeral"},
+    }]),
+    MessagesPlaceholder(variable_name="context"),
+    ("human", "{input}")
+])
+
+# 交互记录批量写入：攒满一批或等待超时后统一写入
+WRITE_BATCH_SIZE = 16
+WRITE_BATCH_WAIT_SECONDS = 0.2
+
+# 启动时的 API 连通性探测会多一次阻塞请求，仅在开发环境设置 EXPRESS_PROBE_API=1 时执行
+PROBE_API = os.getenv("EXPRESS_PROBE_API") == "1"
+
+FALLBACK_REPLY = "抱歉，我现在遇到了一些技术问题，请稍后再试。如有紧急情况，请联系人工客服。"
+
 class ExpressCustomerService:
+    # 连通性探测结果，进程内只探测一次
+    _api_connection_ok: Optional[bool] = None
+
     def __init__(self):
         """初始化快递客服助手"""
         self.api_key = self._get_api_key()
         print(self.api_key)
-        self.base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+        self.base_url = DASHSCOPE_BASE_URL
 
         # 初始化组件
         self.openai_client = None
         self.llm = None
         self.mem0 = None
         self.prompt = None
+        self.semantic_cache = None
+        # 交互记录写入队列，由后台任务按批写入 Mem0
+        self._write_queue = None
+        self._flusher_task = None
 
         self._initialize_components()
     
@@ -41,6 +98,11 @@ class ExpressCustomerService:
 
     def _test_api_connection(self):
         """测试API连接"""
+        if ExpressCustomerService._api_connection_ok is None:
+            ExpressCustomerService._api_connection_ok = self._probe_api_connection()
+        return ExpressCustomerService._api_connection_ok
+
+    def _probe_api_connection(self):
         try:
             response = self.openai_client.chat.completions.create(
                 model="qwen-plus",
@@ -59,20 +121,19 @@ class ExpressCustomerService:
             # 1. 初始化OpenAI客户端
             self.openai_client = OpenAI(
                 api_key=self.api_key,
-                base_url=self.base_url
+                base_url=self.base_url,
+                http_client=get_sync_client()
             )
             logger.info("OpenAI客户端已初始化")
 
-            # 2. 测试api链接
-            if not self._test_api_connection():
+            # 2. 测试api链接（默认跳过，错误由首个真实请求暴露）
+            if PROBE_API and not self._test_api_connection():
                 raise Exception("OpenAI客户端未连接")
 
             # 3. 初始化langchain组件
-            self.llm = ChatOpenAI(
-                model_name="qwen-plus",
-                openai_api_key=self.api_key,
-                base_url=self.base_url,
-                temperature=0.7
+            # 缓存只挂在本实例的模型上，不通过 set_llm_cache 影响进程内的其他模型
+            self.llm = create_dashscope_chat(
+                "qwen-plus", temperature=0.7, cache=SQLiteCache(database_path=LLM_CACHE_PATH)
             )
             logger.info("langchain组件已初始化")
             config = MemoryConfig(
@@ -96,6 +157,10 @@ class ExpressCustomerService:
             )
             self.mem0 = Memory(config=config)
             logger.info("Mem0组件已初始化")
+            self.semantic_cache = SemanticCache(
+                DashScopeEmbeddings(model="text-embedding-v2", dashscope_api_key=self.api_key)
+            )
+            logger.info("语义缓存已初始化")
             self._initialize_prompt()
 
         except Exception as e:
@@ -104,26 +169,7 @@ class ExpressCustomerService:
     
     def _initialize_prompt(self):
         """初始化提示模板"""
-        self.prompt = ChatPromptTemplate.from_messages([
-            SystemMessage(content="""您是一位专业的快递行业智能客服助手。请使用提供的上下文信息来个性化您的回复，记住用户的偏好和历史交互记录。
-
-                您的主要职责包括：
-                1. 快递查询服务：帮助用户查询包裹状态、物流轨迹、预计送达时间
-                2. 寄件服务：提供寄件指导、价格咨询、时效说明、包装建议
-                3. 问题解决：处理快递延误、丢失、损坏等问题，提供解决方案
-                4. 服务咨询：介绍各类快递服务、收费标准、服务范围
-                5. 投诉建议：接收用户反馈，记录投诉信息并提供处理方案
-
-                回复时请保持：
-                - 专业、礼貌、耐心的服务态度
-                - 准确、及时的信息提供
-                - 个性化的服务体验
-                - 如果没有具体信息，可以基于快递行业常识提供建议
-
-                请用中文回复，语气亲切专业。"""),
-            MessagesPlaceholder(variable_name="context"),
-            HumanMessage(content="{input}")
-        ])
+        self.prompt = EXPRESS_PROMPT
         
     def retrieve_context(self, query: str, user_id: str) -> str:
         """从Mem0检索相关上下文信息"""
@@ -161,18 +207,22 @@ class ExpressCustomerService:
                     "content": query
                 }
             ]
-    def generate_response(self,user_input:str,context:List[Dict]) -> str:
+    async def aretrieve_context(self, query: str, user_id: str) -> List[Dict]:
+        """异步检索上下文：Mem0 为同步接口，放到线程池执行，不阻塞事件循环"""
+        return await asyncio.to_thread(self.retrieve_context, query, user_id)
+
+    async def generate_response(self,user_input:str,context:List[Dict]) -> str:
         """使用llm生成回复"""
         try:
             chain = self.prompt | self.llm
-            response = chain.invoke({
+            response = await chain.ainvoke({
                 "context": context,
                 "input": user_input
             })
             return response.content
         except Exception as e:
             logger.error(f"生成回复时出错: {str(e)}")
-            return "抱歉，我现在遇到了一些技术问题，请稍后再试。如有紧急情况，请联系人工客服。"
+            return FALLBACK_REPLY
 
     def save_interaction(self, user_id:str, user_input:str, assistant_response:str):
         """将交互记录保存到Mem0"""
@@ -191,24 +241,93 @@ class ExpressCustomerService:
         except Exception as e:
             logger.warning(f"保存交互记录时出错: {str(e)}")
 
-    def chat_turn(self, user_input: str, user_id: str) -> str:
+    async def chat_turn(self, user_input: str, user_id: str) -> str:
         """处理一次聊天轮次"""
         try:
-            # 检索上下文
-            context = self.retrieve_context(user_input, user_id)
-            
+            # 检索上下文，同时计算问题向量
+            query_vector, context = await asyncio.gather(
+                asyncio.to_thread(self.semantic_cache.embed, user_input),
+                self.aretrieve_context(user_input, user_id)
+            )
+
+            # 上下文与问题中的实体都相同、且问题语义相近时直接复用缓存回复
+            fingerprint = context_fingerprint(
+                user_input, "\n".join(m["content"] for m in context if m["role"] == "system")
+            )
+            cached = self.semantic_cache.lookup(query_vector, user_id, fingerprint)
+            if cached is not None:
+                logger.info("命中语义缓存")
+                return cached
+
             # 生成回复
-            response = self.generate_response(user_input, context)
+            response = await self.generate_response(user_input, context)
+            if response != FALLBACK_REPLY:
+                self.semantic_cache.add(query_vector, user_id, fingerprint, response)
             
-            # 保存交互记录
-            self.save_interaction(user_id, user_input, response)
+            # 交互记录在后台保存，回复无需等待 Mem0 写入完成
+            self._enqueue_interaction(user_id, user_input, response)
             
             return response
         except Exception as e:
             logger.error(f"聊天轮次处理出错: {str(e)}")
-            return "抱歉，我现在遇到了一些技术问题，请稍后再试。如有紧急情况，请联系人工客服。"
+            return FALLBACK_REPLY
+
+    async def batch_chat(self, requests: List[Tuple[str, str]]) -> List[str]:
+        """并发处理多个 (user_input, user_id) 聊天请求，返回前等待本批交互记录写入 Mem0；
+        调用方常以 asyncio.run 驱动，事件循环关闭时后台写入任务会被取消，未写入的记录随之丢失
+        """
+        responses = await asyncio.gather(*(
+            self.chat_turn(user_input, user_id) for user_input, user_id in requests
+        ))
+        await self.wait_pending_saves()
+        return responses
+
+    def _enqueue_interaction(self, user_id: str, user_input: str, assistant_response: str) -> None:
+        """交互记录放入写入队列，首次调用时在当前事件循环中启动后台写入任务"""
+        if self._flusher_task is None or self._flusher_task.done():
+            self._write_queue = asyncio.Queue()
+            self._flusher_task = asyncio.create_task(self._flush_interactions())
+        self._write_queue.put_nowait((user_id, user_input, assistant_response))
+
+    async def _flush_interactions(self) -> None:
+        """后台写入任务：每次收集最多 WRITE_BATCH_SIZE 条记录后批量写入"""
+        loop = asyncio.get_running_loop()
+        queue = self._write_queue
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + WRITE_BATCH_WAIT_SECONDS
+            while len(batch) < WRITE_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await asyncio.to_thread(self._save_interactions, batch)
+            for _ in batch:
+                queue.task_done()
 
-    def run_interactive_chat(self):
+    def _save_interactions(self, batch: List[Tuple[str, str, str]]) -> None:
+        """同一用户的多条交互合并为一次 Mem0 写入，减少 API 往返"""
+        messages_by_user: Dict[str, List[Dict]] = {}
+        for user_id, user_input, assistant_response in batch:
+            messages_by_user.setdefault(user_id, []).extend((
+                {"role": "user", "content": user_input},
+                {"role": "assistant", "content": assistant_response}
+            ))
+        for user_id, messages in messages_by_user.items():
+            try:
+                self.mem0.add(messages, user_id=user_id)
+            except Exception as e:
+                logger.warning(f"保存交互记录时出错: {str(e)}")
+
+    async def wait_pending_saves(self) -> None:
+        """等待写入队列中的交互记录全部写入"""
+        if self._write_queue is not None and not self._flusher_task.done():
+            await self._write_queue.join()
+
+    async def run_interactive_chat(self):
         """运行交互式聊天"""
         print("=" * 60)
         print("欢迎使用智能快递客服助手！")
@@ -227,7 +346,8 @@ class ExpressCustomerService:
 
         while True:
             try:
-                user_input = input("您: ").strip()
+                # 等待输入时让出事件循环，后台保存任务继续执行
+                user_input = (await asyncio.to_thread(input, "您: ")).strip()
                 if user_input.lower() in ['quit', 'exit', '再见', '退出', 'bye']:
                     print("快递客服: 感谢您使用我们的服务！祝您生活愉快，期待下次为您服务！")
                     break
@@ -237,7 +357,7 @@ class ExpressCustomerService:
                     continue
 
 
-                response = self.chat_turn(user_input, user_id)
+                response = await self.chat_turn(user_input, user_id)
                 print(f"快递客服: {response}\n")
 
             except KeyboardInterrupt:
@@ -247,6 +367,8 @@ class ExpressCustomerService:
                 logger.error(f"交互过程中出错: {str(e)}")
                 print("快递客服: 系统出现异常，请稍后重试。")
 
+        await self.wait_pending_saves()
+
 def main():
     """主程序入口"""
     try:
@@ -254,7 +376,7 @@ def main():
         service = ExpressCustomerService()
         
         # 运行交互式聊天
-        service.run_interactive_chat()
+        asyncio.run(service.run_interactive_chat())
         
     except Exception as e:
         print(f"程序启动失败: {str(e)}")
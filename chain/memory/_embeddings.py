@@ -0,0 +1,92 @@
+'''
+Description: 向量化请求微批处理：短时间内的异步向量化请求合并为一次 DashScope 调用
+'''
+import asyncio
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_community.embeddings import DashScopeEmbeddings
+from langchain_community.embeddings.dashscope import embed_with_retry
+
+# DashScope 向量化接口单次最多 25 条文本
+EMBED_BATCH_SIZE = 25
+EMBED_BATCH_WAIT_SECONDS = 0.01
+
+class MicroBatchEmbeddings(Embeddings):
+    """异步接口按批合并请求；同步接口直接透传。
+    查询与文档的向量计算方式不同（text_type），分别成批请求
+    """
+    def __init__(
+        self,
+        embeddings: Optional[DashScopeEmbeddings] = None,
+        max_batch_size: int = EMBED_BATCH_SIZE,
+        max_wait_seconds: float = EMBED_BATCH_WAIT_SECONDS
+    ):
+        self.embeddings = embeddings or DashScopeEmbeddings()
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._queue = None
+        self._worker = None
+        self._loop = None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return list(await asyncio.gather(*(self._submit("document", text) for text in texts)))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self._submit("query", text)
+
+    async def _submit(self, text_type: str, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        # 每次 asyncio.run 都是新的事件循环，队列和后台任务需跟随当前循环重建
+        if self._loop is not loop or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._loop = loop
+            self._worker = loop.create_task(self._run())
+        future = loop.create_future()
+        self._queue.put_nowait((text_type, text, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_wait_seconds
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            for text_type in ("query", "document"):
+                items = [(text, future) for kind, text, future in batch if kind == text_type]
+                if not items:
+                    continue
+                try:
+                    vectors = await asyncio.to_thread(self._embed_batch, text_type, [text for text, _ in items])
+                except Exception as e:
+                    for _, future in items:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for (_, future), vector in zip(items, vectors):
+                    if not future.done():
+                        future.set_result(vector)
+
+    def _embed_batch(self, text_type: str, texts: List[str]) -> List[List[float]]:
+        if text_type == "document":
+            return self.embeddings.embed_documents(texts)
+        # DashScopeEmbeddings.embed_query 只接受单条文本，批量查询向量直接调用其带重试的底层请求
+        results = embed_with_retry(
+            self.embeddings, input=texts, text_type="query", model=self.embeddings.model
+        )
+        return [item["embedding"] for item in results]
@@ -0,0 +1,35 @@
+'''
+Description: 按消息缓存 token 估算结果，对话历史中未变化的消息只计算一次
+'''
+from collections import OrderedDict
+from typing import Hashable, Sequence
+
+from langchain_core.messages import BaseMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+TOKEN_CACHE_SIZE = 4096
+
+_token_cache: "OrderedDict[Hashable, int]" = OrderedDict()
+
+def _cache_key(message: BaseMessage) -> Hashable:
+    # LangGraph 写入状态的消息都带有稳定的 id；没有 id 的按类型和内容区分
+    if message.id:
+        return message.type, message.id
+    content = message.content
+    return message.type, content if isinstance(content, str) else repr(content)
+
+def cached_token_counter(messages: Sequence[BaseMessage]) -> int:
+    """与 count_tokens_approximately 相同的估算方式，逐条缓存，每轮只计算新增的消息"""
+    total = 0
+    for message in messages:
+        key = _cache_key(message)
+        tokens = _token_cache.get(key)
+        if tokens is None:
+            tokens = count_tokens_approximately([message])
+            _token_cache[key] = tokens
+            if len(_token_cache) > TOKEN_CACHE_SIZE:
+                _token_cache.popitem(last=False)
+        else:
+            _token_cache.move_to_end(key)
+        total += tokens
+    return total
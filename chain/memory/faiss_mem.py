@@ -1,15 +1,32 @@
+import sys
 import os
+
+# 添加项目根目录到Python路径，直接以脚本运行时也能导入 chain 包
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
 import uuid
 import atexit
+import hashlib
 import logging
+import sqlite3
+import struct
+import threading
 from dotenv import load_dotenv
-from typing import List,Dict,Any,Optional
+from typing import List,Dict,Any,Optional,Tuple
 from datetime import datetime
+from functools import lru_cache
+from urllib.parse import quote, unquote
+
+import faiss
+import numpy as np
+import orjson
 
 from langgraph.graph import StateGraph,MessagesState,START,END
 from langgraph.prebuilt import ToolNode
 from langgraph.checkpoint.memory import MemorySaver
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.embeddings import DashScopeEmbeddings
 from langchain_community.chat_models.tongyi import ChatTongyi
 from langchain_core.documents import Document
@@ -18,15 +35,29 @@ from langchain_core.tools import tool
 from langchain_core.messages.utils import get_buffer_string
 from langchain_core.prompts import ChatPromptTemplate,MessagesPlaceholder
 from langchain_core.messages import AIMessage, HumanMessage
+from chain.memory._tokens import cached_token_counter
 
 load_dotenv()
 FAISS_INDEX_PATH = "faiss_memory_index"
 FAISS_DIMENSION = 1536
-FAISS_INDEX_TYPE = "IndexFlatIP"
+FAISS_INDEX_TYPE = "IndexHNSWSQ"
+# HNSW 图参数：M 为每个节点的邻居数，efSearch 为检索时的候选集大小（越大召回越高、越慢）
+FAISS_HNSW_M = 32
+FAISS_HNSW_EF_SEARCH = 64
+# 记忆按用户分区存储；LEGACY_INDEX_NAME 为旧版本所有用户共用的索引文件名
+USER_INDEX_PREFIX = "user_"
+LEGACY_INDEX_NAME = "index"
+# 新增记忆先追加写入预写日志，每累计 SNAPSHOT_EVERY 条或进程退出时才整体保存索引
+SNAPSHOT_EVERY = 100
+_WAL_HEADER = struct.Struct("<I")
+EMBEDDING_CACHE_PATH = "faiss_embedding_cache.db"
 
 DEFAULT_SEARCH_K = 5
 MAX_MEMORY_DISPLAY = 3
-MEMORY_TRUNCATE_LENGTH = 800
+# 记忆检索查询只取最近对话，按 token 预算从最新消息向前截取
+MEMORY_QUERY_MAX_TOKENS = 200
+# 对话记忆先缓存在内存中，攒满一批后统一向量化写入
+MEMORY_FLUSH_SIZE = 8
 
 logging.basicConfig(
     level=logging.INFO,
@@ -34,6 +65,74 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=1)
+def _get_embedding_cache() -> sqlite3.Connection:
+    """进程内共享的向量缓存库：表 emb(hash, vec)，向量以 float32 字节存储"""
+    conn = sqlite3.connect(EMBEDDING_CACHE_PATH, check_same_thread=False)
+    conn.execute("CREATE TABLE IF NOT EXISTS emb (hash TEXT PRIMARY KEY, vec BLOB)")
+    return conn
+
+_embedding_cache_lock = threading.Lock()
+
+def _embedding_key(text_type: str, text: str) -> str:
+    # 查询向量与文档向量的计算方式不同，缓存键需区分类型
+    return hashlib.sha1(f"{text_type}:{text}".encode("utf-8")).hexdigest()
+
+class CachedDashScopeEmbeddings(DashScopeEmbeddings):
+    """带 SQLite 持久缓存的 DashScope 向量化，相同文本只请求一次接口"""
+
+    def _embed_with_cache(self, text_type: str, texts: List[str], embed) -> List[List[float]]:
+        keys = [_embedding_key(text_type, text) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        conn = _get_embedding_cache()
+        with _embedding_cache_lock:
+            rows = conn.execute(
+                f"SELECT hash, vec FROM emb WHERE hash IN ({','.join('?' * len(unique_keys))})",
+                unique_keys
+            ).fetchall()
+        vectors = {key: np.frombuffer(vec, dtype=np.float32).tolist() for key, vec in rows}
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if missing:
+            embedded = embed(list(missing.values()))
+            with _embedding_cache_lock:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO emb (hash, vec) VALUES (?, ?)",
+                    [
+                        (key, np.asarray(vector, dtype=np.float32).tobytes())
+                        for key, vector in zip(missing, embedded)
+                    ]
+                )
+                conn.commit()
+            vectors.update(zip(missing, embedded))
+        return [vectors[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._embed_with_cache("document", texts, super().embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_with_cache(
+            "query", [text], lambda texts: [super(CachedDashScopeEmbeddings, self).embed_query(texts[0])]
+        )[0]
+
+def _new_hnsw_index() -> "faiss.IndexHNSWSQ":
+    """创建内积度量的 HNSW 索引，向量写入前归一化，内积即余弦相似度。
+    向量按 int8 标量量化存储（每维 1 字节，内存为 float32 的 1/4）：归一化向量的分量都在 [-1, 1] 内，
+    量化区间固定为 [-1, 1]，无需用真实数据训练，每维误差不超过 1/255
+    """
+    index = faiss.IndexHNSWSQ(
+        FAISS_DIMENSION, faiss.ScalarQuantizer.QT_8bit_uniform, FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT
+    )
+    index.train(np.array([[-1.0] * FAISS_DIMENSION, [1.0] * FAISS_DIMENSION], dtype=np.float32))
+    index.hnsw.efSearch = FAISS_HNSW_EF_SEARCH
+    return index
+
+def _user_index_name(user_id: str) -> str:
+    """用户分区的索引文件名：{index_path}/user_{user_id}.faiss"""
+    return USER_INDEX_PREFIX + quote(user_id, safe="")
+
 class FAISSMemoryManager:
     """初始化FAISS记忆管理器
     
@@ -47,9 +146,18 @@ class FAISSMemoryManager:
             index_path: FAISS索引文件路径
         """
         self.index_path = index_path
-        self.embeddings = DashScopeEmbeddings()
-        self.vector_store = None
+        self.embeddings = CachedDashScopeEmbeddings()
+        # 批量写入和检索时使用全部 CPU 核心
+        faiss.omp_set_num_threads(os.cpu_count() or 1)
+        # 每个用户一个独立的向量存储，检索只在该用户的分区内进行
+        self.user_stores: Dict[str, FAISS] = {}
+        # 自上次保存以来有新增记忆的用户
+        self._dirty_users = set()
+        self._wal_path = f"{index_path}.wal"
+        self._pending_snapshot = 0
         self._initialize_store()
+        self._replay_wal()
+        self._wal = open(self._wal_path, "ab")
 
     def _initialize_store(self) -> None:
         """初始化或加载FAISS向量存储"""
@@ -57,55 +165,146 @@ class FAISSMemoryManager:
             if os.path.exists(self.index_path):
                 self._load_existing_index()
             else:
-                self._create_new_index()
+                logger.info("创建新的FAISS向量索引")
+                print("[FAISS]创建新的向量索引")
         except Exception as e:
             logger.error(f"初始化FAISS存储失败：{e}")
-            self._create_new_index()
+            self.user_stores = {}
     
     def _load_existing_index(self) -> None:
         """加载现有的FAISS索引"""
         try:
-            self.vector_store = FAISS.load_local(
-                self.index_path,
-                self.embeddings,
-                allow_dangerous_deserialization=True
-            )
-            vector_count = self.vector_store.index.ntotal
-            logger.info(f"成功加载现有FAISS索引，包含{vector_count}个向量")
+            for file_name in os.listdir(self.index_path):
+                if not (file_name.startswith(USER_INDEX_PREFIX) and file_name.endswith(".faiss")):
+                    continue
+                index_name = file_name[:-len(".faiss")]
+                store = FAISS.load_local(
+                    self.index_path,
+                    self.embeddings,
+                    index_name=index_name,
+                    allow_dangerous_deserialization=True,
+                    normalize_L2=True,
+                    distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+                )
+                store.index.hnsw.efSearch = FAISS_HNSW_EF_SEARCH
+                self.user_stores[unquote(index_name[len(USER_INDEX_PREFIX):])] = store
+
+            if os.path.exists(os.path.join(self.index_path, f"{LEGACY_INDEX_NAME}.faiss")):
+                self._migrate_legacy_index()
+
+            vector_count = self._total_vectors()
+            logger.info(f"成功加载现有FAISS索引，包含{len(self.user_stores)}个用户分区、{vector_count}个向量")
             print(f"[FAISS] 加载现有索引：{vector_count}个记忆向量")
         except Exception as e:
             logger.error(f"加载FAISS索引失败：{e}，将创建新索引")
             raise e
-    
-    def _create_new_index(self) -> None:
-        """创建新的FAISS索引"""
-        try:
-            init_doc = "系统初始化文档 - FAISS向量数据库已就绪"
-            self.vector_store = FAISS.from_texts(
-                [init_doc],
-                self.embeddings,
-                metadatas = [{
-                    "user_id":"system",
-                    "type":"init",
-                    "timestamp":datetime.now().isoformat(),
-                    "id":str(uuid.uuid4())
-                }]
+
+    def _migrate_legacy_index(self) -> None:
+        """旧版本所有用户共用一个 Flat 索引：按 user_id 拆分为各用户的 HNSW 分区，
+        向量直接从旧索引取出，无需重新请求向量化接口；拆分保存后删除旧索引文件
+        """
+        legacy = FAISS.load_local(
+            self.index_path,
+            self.embeddings,
+            index_name=LEGACY_INDEX_NAME,
+            allow_dangerous_deserialization=True
+        )
+        for position, doc_id in legacy.index_to_docstore_id.items():
+            document = legacy.docstore.search(doc_id)
+            user_id = document.metadata.get("user_id")
+            if user_id is None or document.metadata.get("type") == "init":
+                continue
+            vector = legacy.index.reconstruct(position)
+            self._get_user_store(user_id).add_embeddings(
+                [(document.page_content, vector.tolist())],
+                metadatas=[document.metadata],
+                ids=[doc_id]
             )
-            logger.info("创建新的FAISS向量索引")
-            print("[FAISS]创建新的向量索引")
+            self._dirty_users.add(user_id)
+
+        if self.save_index():
+            for suffix in (".faiss", ".pkl"):
+                os.remove(os.path.join(self.index_path, LEGACY_INDEX_NAME + suffix))
+        logger.info(f"已将旧版FAISS索引拆分为{len(self.user_stores)}个用户分区")
+
+    def _replay_wal(self) -> None:
+        """将上次快照之后写入预写日志的记忆重新加入索引，随后保存快照并清空日志"""
+        if not os.path.exists(self._wal_path):
+            return
+        try:
+            with open(self._wal_path, "rb") as f:
+                data = f.read()
+            known_ids = {
+                user_id: set(store.index_to_docstore_id.values())
+                for user_id, store in self.user_stores.items()
+            }
+            offset = replayed = 0
+            while offset + _WAL_HEADER.size <= len(data):
+                (length,) = _WAL_HEADER.unpack_from(data, offset)
+                offset += _WAL_HEADER.size
+                if offset + length > len(data):
+                    break  # 进程中断导致的不完整记录
+                record = orjson.loads(data[offset:offset + length])
+                offset += length
+                user_id, metadata = record["user_id"], record["metadata"]
+                # 快照已保存但日志未清空时跳过已存在的记忆
+                if metadata["id"] in known_ids.setdefault(user_id, set()):
+                    continue
+                self._get_user_store(user_id).add_embeddings(
+                    [(record["content"], record["vector"])], metadatas=[metadata], ids=[metadata["id"]]
+                )
+                known_ids[user_id].add(metadata["id"])
+                self._dirty_users.add(user_id)
+                replayed += 1
+            logger.info(f"从预写日志恢复{replayed}条记忆")
+            if self.save_index():
+                os.remove(self._wal_path)
         except Exception as e:
-            logger.error(f"创建新的FAISS索引失败：{e}")
-            raise e
+            logger.error(f"重放预写日志失败：{e}")
+
+    def _append_wal(self, user_id: str, content: str, metadata: Dict[str, str], vector: List[float]) -> None:
+        payload = orjson.dumps({
+            "user_id": user_id,
+            "content": content,
+            "metadata": metadata,
+            "vector": vector
+        })
+        self._wal.write(_WAL_HEADER.pack(len(payload)) + payload)
+
+    def _get_user_store(self, user_id: str) -> FAISS:
+        """获取用户的向量存储，不存在时创建空的 HNSW 分区"""
+        store = self.user_stores.get(user_id)
+        if store is None:
+            store = FAISS(
+                embedding_function=self.embeddings,
+                index=_new_hnsw_index(),
+                docstore=InMemoryDocstore(),
+                index_to_docstore_id={},
+                normalize_L2=True,
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+            )
+            self.user_stores[user_id] = store
+        return store
+
+    def _total_vectors(self) -> int:
+        return sum(store.index.ntotal for store in self.user_stores.values())
 
     def save_index(self) -> bool:
-        """保存FAISS索引到磁盘
+        """保存FAISS索引到磁盘（只写有新增记忆的用户分区）
         Returns:
             bool: 是否保存成功
         """
 
         try:
-            self.vector_store.save_local(self.index_path)
-            vector_count = self.vector_store.index.ntotal
+            for user_id in list(self._dirty_users):
+                self.user_stores[user_id].save_local(self.index_path, index_name=_user_index_name(user_id))
+                self._dirty_users.discard(user_id)
+            # 快照已包含日志中的全部记忆
+            wal = getattr(self, "_wal", None)
+            if wal is not None and not wal.closed:
+                wal.seek(0)
+                wal.truncate()
+            self._pending_snapshot = 0
             logger.info(f"成功保存FAISS索引到{self.index_path}")
             print(f"[FAISS] 保存索引到{self.index_path}")
             return True
@@ -123,22 +322,71 @@ class FAISSMemoryManager:
             Returns:
                 bool: 是否添加成功
         """
+        return self.add_memories([(content, user_id)])
+
+    def add_memories(self, items: List[Tuple[str, str]]) -> bool:
+        """
+        批量添加记忆，全部文本通过一次向量化请求处理
+
+        Args:
+            items: (记忆内容, 用户ID) 列表
+
+            Returns:
+                bool: 是否添加成功
+        """
+        if not items:
+            return True
         try:
-            document = Document(
-                page_content=content,
-                metadata={
+            # 整批向量放入连续的 float32 矩阵，一次完成归一化
+            vectors = np.ascontiguousarray(
+                self.embeddings.embed_documents([content for content, _ in items]), dtype=np.float32
+            )
+            faiss.normalize_L2(vectors)
+
+            metadatas = []
+            rows_by_user: Dict[str, List[int]] = {}
+            for row, (content, user_id) in enumerate(items):
+                metadata = {
                     "user_id":user_id,
                     "id":str(uuid.uuid4()),
                     "timestamp":datetime.now().isoformat()
                 }
-            )
-            self.vector_store.add_documents([document])
-            logger.info(f"添加记忆成功：{content[:50]}...")
+                metadatas.append(metadata)
+                rows_by_user.setdefault(user_id, []).append(row)
+                self._append_wal(user_id, content, metadata, vectors[row].tolist())
+            self._wal.flush()
+
+            for user_id, rows in rows_by_user.items():
+                self._add_vectors(
+                    self._get_user_store(user_id),
+                    vectors[rows],
+                    [items[row][0] for row in rows],
+                    [metadatas[row] for row in rows]
+                )
+                self._dirty_users.add(user_id)
+            logger.info(f"添加{len(items)}条记忆成功：{items[0][0][:50]}...")
+
+            self._pending_snapshot += len(items)
+            if self._pending_snapshot >= SNAPSHOT_EVERY:
+                self.save_index()
             return True
         except Exception as e:
             logger.error(f"添加记忆到向量存储失败：{e}")
             return False
 
+    @staticmethod
+    def _add_vectors(store: FAISS, vectors: np.ndarray, contents: List[str], metadatas: List[Dict[str, str]]) -> None:
+        """已归一化的向量直接写入 FAISS 索引，同步更新文档存储与 ID 映射"""
+        start = store.index.ntotal
+        store.index.add(vectors)
+        store.docstore.add({
+            metadata["id"]: Document(page_content=content, metadata=metadata)
+            for content, metadata in zip(contents, metadatas)
+        })
+        store.index_to_docstore_id.update({
+            start + offset: metadata["id"] for offset, metadata in enumerate(metadatas)
+        })
+
     def search_memories(self,query:str,user_id:str, k :int = DEFAULT_SEARCH_K) -> List[str]:
         """
         搜索记忆
@@ -152,17 +400,12 @@ class FAISSMemoryManager:
                 List[str]: 记忆列表
         """
         try:
-            documents = self.vector_store.similarity_search(
-                query = query,
-                k = k *2
-            )
-
-            user_memories = [
-                doc for doc in documents
-                if(doc.metadata.get("user_id") == user_id and doc.metadata.get("type") != "init")
-            ]
+            store = self.user_stores.get(user_id)
+            if store is None:
+                return []
 
-            memories = [doc.page_content for doc in user_memories[:k]]
+            documents = store.similarity_search(query = query, k = k)
+            memories = [doc.page_content for doc in documents]
 
             if memories:
                 logger.info(f"检索到{len(memories)}条相关记忆")
@@ -178,9 +421,10 @@ class FAISSMemoryManager:
             Dict[str, Any]: 统计信息
         """
         try:
-            total_vectors = self.vector_store.index.ntotal
+            total_vectors = self._total_vectors()
             return {
                 "total_vectors":total_vectors,
+                "user_partitions":len(self.user_stores),
                 "index_path":self.index_path,
                 "embedding_dimension":FAISS_DIMENSION,
                 "index_type":FAISS_INDEX_TYPE
@@ -189,6 +433,7 @@ class FAISSMemoryManager:
             logger.error(f"获取统计信息失败：{e}")
             return {
                 "total_vectors":0,
+                "user_partitions":0,
                 "index_path":self.index_path,
                 "embedding_dimension":FAISS_DIMENSION,
                 "index_type":FAISS_INDEX_TYPE
@@ -202,19 +447,19 @@ model = ChatTongyi(
     streaming=True
 )
 
+# 系统提示不含变量，保证请求前缀稳定以命中服务端前缀缓存；检索到的记忆放在最后一条消息中
 prompt = ChatPromptTemplate.from_messages([
     ("system", """你是一个具有长期记忆能力的AI助手。
 
     记忆能力说明：
     - 我可以记住我们之前的对话内容
     - 我会根据相关记忆来回答你的问题
-    - 如果需要保存重要信息，我会使用记忆工具
-
-    当前相关记忆：
+    - 如果需要保存重要信息，我会使用记忆工具"""),
+    MessagesPlaceholder(variable_name="messages"),
+    ("human", """当前相关记忆：
     {recall_memory}
 
-    请根据上述记忆和当前对话，提供有帮助的回答。"""),
-    MessagesPlaceholder(variable_name="messages")
+    请根据上述记忆和当前对话，提供有帮助的回答。""")
 ])
 
 def get_user_id(config:RunnableConfig) -> str:
@@ -242,32 +487,10 @@ def save_recall_memory(memory:str,config:RunnableConfig) -> str:
     user_id = get_user_id(config)
     success = memory_manager.add_memory(memory, user_id)
     if success:
-        memory_manager.save_index()
         return f"记忆已保存：{memory[:50]}..."
     else:
         return "记忆保存失败"
 
-@tool
-def get_recall_memories(query:str,config:RunnableConfig) -> List[str]:
-    """获取记忆
-
-    Args:
-    query: 查询内容
-    config: 运行配置
-
-    Returns:
-        List[str]: 记忆列表
-    """
-    user_id = get_user_id(config)
-    memories = memory_manager.search_memories(query, user_id,MAX_MEMORY_DISPLAY)
-    if memories:
-        print(f"[记忆检索]找到{len(memories)}条相关记忆")
-        for i, memory in enumerate(memories,1):
-            print(f"{i}. {memory[:100]}...")
-        return memories
-    else:
-        return ["没有找到相关记忆"]
-
 @tool
 def search_recall_memories(query:str, config:RunnableConfig) -> List[str]:
     """从FAISS向量存储中搜索相关记忆
@@ -296,6 +519,17 @@ class State(MessagesState):
     """
     recall_memories: List[str]
 
+def _recent_conversation(messages, max_tokens: int = MEMORY_QUERY_MAX_TOKENS) -> str:
+    """从最新消息向前累计 token，超出预算时停止，至少保留最后一条消息"""
+    start = len(messages) - 1
+    total = cached_token_counter(messages[start:])
+    while start > 0:
+        total += cached_token_counter(messages[start - 1:start])
+        if total > max_tokens:
+            break
+        start -= 1
+    return get_buffer_string(messages[start:])
+
 def load_memories(state,config:RunnableConfig) -> State:
     """
     加载相关记忆节点
@@ -307,8 +541,7 @@ def load_memories(state,config:RunnableConfig) -> State:
     Returns:
         State: 更新后的对话状态
     """
-    convo_str = get_buffer_string(state["messages"])
-    convo_str = convo_str[:MEMORY_TRUNCATE_LENGTH]
+    convo_str = _recent_conversation(state["messages"])
     
     # 搜索相关记忆
     recall_memories = search_recall_memories.invoke(convo_str, config)
@@ -317,6 +550,9 @@ def load_memories(state,config:RunnableConfig) -> State:
         "recall_memories": recall_memories,
     }
 
+# 工具绑定只需一次，所有轮次复用
+model_with_tools = model.bind_tools([save_recall_memory])
+
 def agent(state) -> dict:
     """
     AI代理节点
@@ -329,7 +565,6 @@ def agent(state) -> dict:
     """
     # 确保state是字典格式
 
-    model_with_tools = model.bind_tools([save_recall_memory])
     recall_str = ""
     if state.get("recall_memories"):
         recall_str = "\n".join([f"• {memory}" for memory in state["recall_memories"]])
@@ -356,29 +591,29 @@ def save_memory(state,config:RunnableConfig) -> State:
         Returns:
             State: 更新后的对话状态
         """
+        # MessagesState 中都是消息对象（HumanMessage/AIMessage），没有 role 属性；
+        # save_memory 紧跟在 agent 之后，本轮问答就是最后两条消息
         messages = state["messages"]
         if len(messages) >= 2:
-            user_msg = None
-            ai_msg = None
-
-            for msg in reversed(messages):
-                if hasattr(msg,"role"):
-                    if msg.role == "user" and user_msg is None:
-                        user_msg = msg.content
-                    elif msg.role == "assistant" and ai_msg is None:
-                        ai_msg = msg.content
-                elif isinstance(msg,dict):
-                    if msg.get("role") == "user" and user_msg is None:
-                        user_msg = msg.get("content")
-                    elif msg.get("role") == "assistant" and ai_msg is None:
-                        ai_msg = msg.get("content")
-                if user_msg and ai_msg:
-                    break
-            if user_msg and ai_msg:
-                memory_content = f"用户：{user_msg}\n助手：{ai_msg}"
-                save_recall_memory.invoke(memory_content,config)
+            user_msg, ai_msg = messages[-2], messages[-1]
+            if user_msg.type == "human" and ai_msg.type == "ai" and ai_msg.content:
+                memory_content = f"用户：{user_msg.content}\n助手：{ai_msg.content}"
+                _pending_memories.append((memory_content, get_user_id(config)))
+                if len(_pending_memories) >= MEMORY_FLUSH_SIZE:
+                    flush_pending_memories()
         return {}
 
+# 待写入的对话记忆：(记忆内容, 用户ID)
+_pending_memories: List[Tuple[str, str]] = []
+
+def flush_pending_memories() -> None:
+    """将缓存的对话记忆批量写入向量存储"""
+    if not _pending_memories:
+        return
+    items = _pending_memories[:]
+    _pending_memories.clear()
+    memory_manager.add_memories(items)
+
 def route_tools(state):
     """工具路由节点
     
@@ -407,10 +642,7 @@ def build_graph() -> StateGraph:
     builder.add_node("load_memories", load_memories)
     builder.add_node("agent", agent)
     builder.add_node("save_memory", save_memory)
-    builder.add_node("tools", ToolNode([
-        save_recall_memory,
-        get_recall_memories
-    ]))
+    builder.add_node("tools", ToolNode([save_recall_memory]))
 
     builder.add_edge(START, 'load_memories')
     builder.add_edge('load_memories', 'agent')
@@ -420,6 +652,9 @@ def build_graph() -> StateGraph:
 
     return builder.compile()
 
+# 状态图在导入时编译一次，调用方直接复用
+GRAPH = build_graph()
+
 # ================================
 # 演示和工具函数
 # ================================
@@ -526,7 +761,7 @@ def main():
     print_stats()
     
     # 构建图
-    graph = build_graph()
+    graph = GRAPH
     
     # 配置
     config = {
@@ -551,12 +786,14 @@ def main():
         logger.error(f"演示过程中发生错误: {e}")
         print(f" 演示失败: {e}")
     finally:
-        # 确保保存索引
+        # 确保写入缓存的记忆并保存索引
+        flush_pending_memories()
         memory_manager.save_index()
 
 
-# 注册退出时保存索引
+# 注册退出时保存索引；atexit 后注册先执行，先写入缓存的记忆再保存
 atexit.register(memory_manager.save_index)
+atexit.register(flush_pending_memories)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,138 @@
+'''
+Description: 基于向量相似度的语义响应缓存，语义相近的问题直接复用已有回复，跳过 LLM 调用
+'''
+import os
+import re
+import atexit
+import hashlib
+import logging
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+import faiss
+import numpy as np
+import orjson
+from langchain_community.embeddings import DashScopeEmbeddings
+
+SEMANTIC_CACHE_PATH = "semantic_cache_index"
+# 只有措辞不同的同一问题才复用回复；“SF1 到哪了”与“SF2 到哪了”这类问题相似度也很高，另由指纹区分
+SIMILARITY_THRESHOLD = 0.95
+# 每个用户最多缓存的回复数，超出时淘汰最早写入的记录
+MAX_ENTRIES_PER_USER = 256
+# 每个用户一个索引文件：{index_path}/user_<quote(user_id)>.faiss，回复及其指纹统一保存在 responses.json
+USER_INDEX_PREFIX = "user_"
+# 问题中含数字的词（运单号、订单号、日期等），不同取值的问题不能共用回复
+ENTITY_PATTERN = re.compile(r"[A-Za-z0-9]*[0-9][A-Za-z0-9]*")
+
+logger = logging.getLogger(__name__)
+
+def _user_index_name(user_id: str) -> str:
+    return USER_INDEX_PREFIX + quote(user_id, safe="") + ".faiss"
+
+def context_fingerprint(query: str, context: str) -> str:
+    """问题中的实体与检索到的上下文的指纹；只有指纹相同的记录才可能命中，
+    上下文（如 Mem0 中的包裹状态）变化后旧回复自然失效
+    """
+    entities = sorted(set(ENTITY_PATTERN.findall(query.upper())))
+    return hashlib.sha1(orjson.dumps([entities, context])).hexdigest()
+
+class SemanticCache:
+    """语义缓存：按用户分别维护 FAISS 内积索引（向量已归一化，内积即余弦相似度），
+    responses 按相同下标保存对应的 (指纹, 回复)；检索只在当前用户的索引内进行，不受其他用户的相似问题影响，
+    且只返回指纹相同、相似度不低于阈值的回复
+    """
+    def __init__(
+        self,
+        embeddings: Optional[DashScopeEmbeddings] = None,
+        index_path: str = SEMANTIC_CACHE_PATH,
+        threshold: float = SIMILARITY_THRESHOLD
+    ):
+        self.embeddings = embeddings or DashScopeEmbeddings()
+        self.index_path = index_path
+        self.threshold = threshold
+        self.indexes: Dict[str, faiss.IndexFlatIP] = {}  # 用户首次写入时按向量维度创建
+        self.responses: Dict[str, List[List[str]]] = {}
+        self._dirty_users = set()
+        self._load()
+        atexit.register(self.save)
+
+    @property
+    def _responses_file(self) -> str:
+        return os.path.join(self.index_path, "responses.json")
+
+    def _load(self) -> None:
+        """加载磁盘上的缓存，不存在或损坏时从空缓存开始"""
+        try:
+            if os.path.exists(self._responses_file):
+                with open(self._responses_file, "rb") as f:
+                    responses = orjson.loads(f.read())
+                for user_id, user_responses in responses.items():
+                    self.indexes[user_id] = faiss.read_index(
+                        os.path.join(self.index_path, _user_index_name(user_id))
+                    )
+                    self.responses[user_id] = user_responses
+            logger.info(f"加载语义缓存：{len(self.indexes)}个用户，{sum(map(len, self.responses.values()))}条记录")
+        except Exception as e:
+            logger.error(f"加载语义缓存失败：{e}，将使用空缓存")
+            self.indexes = {}
+            self.responses = {}
+            self._dirty_users = set()
+
+    def save(self) -> bool:
+        """保存有新增记录的用户索引和全部回复到磁盘"""
+        if not self._dirty_users:
+            return False
+        try:
+            os.makedirs(self.index_path, exist_ok=True)
+            for user_id in self._dirty_users:
+                faiss.write_index(self.indexes[user_id], os.path.join(self.index_path, _user_index_name(user_id)))
+            with open(self._responses_file, "wb") as f:
+                f.write(orjson.dumps(self.responses))
+            self._dirty_users.clear()
+            return True
+        except Exception as e:
+            logger.error(f"保存语义缓存失败：{e}")
+            return False
+
+    def embed(self, query: str) -> Optional[np.ndarray]:
+        """计算归一化的问题向量，失败时返回 None（跳过缓存）"""
+        try:
+            vector = np.asarray([self.embeddings.embed_query(query)], dtype="float32")
+        except Exception as e:
+            logger.warning(f"计算问题向量失败：{e}")
+            return None
+        faiss.normalize_L2(vector)
+        return vector
+
+    def lookup(self, vector: Optional[np.ndarray], user_id: str, fingerprint: str) -> Optional[str]:
+        """在该用户的索引中查找指纹相同且相似度超过阈值的缓存回复"""
+        index = self.indexes.get(user_id)
+        if vector is None or index is None or index.ntotal == 0:
+            return None
+        # 单个用户的记录数有上限，直接按相似度排序全部取回，再逐条比对指纹
+        scores, ids = index.search(vector, index.ntotal)
+        for score, position in zip(scores[0], ids[0]):
+            if score < self.threshold:
+                break
+            entry_fingerprint, response = self.responses[user_id][position]
+            if entry_fingerprint == fingerprint:
+                return response
+        return None
+
+    def add(self, vector: Optional[np.ndarray], user_id: str, fingerprint: str, response: str) -> None:
+        """写入一条问题向量与回复，超出上限时淘汰该用户最早的记录"""
+        if vector is None:
+            return
+        index = self.indexes.get(user_id)
+        if index is None:
+            index = self.indexes[user_id] = faiss.IndexFlatIP(vector.shape[1])
+            self.responses[user_id] = []
+        responses = self.responses[user_id]
+        overflow = len(responses) + 1 - MAX_ENTRIES_PER_USER
+        if overflow > 0:
+            # IndexFlat 删除后其余向量的下标前移，与回复列表保持一致
+            index.remove_ids(np.arange(overflow, dtype="int64"))
+            del responses[:overflow]
+        index.add(vector)
+        responses.append([fingerprint, response])
+        self._dirty_users.add(user_id)
@@ -6,15 +6,18 @@ FilePath: /RAG_service/chain/memory/short_mem.py
 Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查看配置 进行设置: https://github.com/OBKoro1/koro1FileHeader/wiki/%E9%85%8D%E7%BD%AE
 '''
 import os
-import json
+import sqlite3
+import sys
+import orjson
 from langchain.agents import create_agent
 from langchain_community.chat_models import ChatTongyi
-from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
 from dotenv import load_dotenv
 
 load_dotenv()
 
-checkpointer = InMemorySaver()
+# 对话检查点持久化到 SQLite，重启后可继续之前的会话
+checkpointer = SqliteSaver(sqlite3.connect("short_mem.sqlite", check_same_thread=False))
 
 def get_weather(city:str) -> str:
     """Get weather for a given city."""
@@ -48,36 +51,12 @@ my_response = agent.invoke(
     config=config
 )
 
-def serialize_response(obj):
-    """将响应对象转换为可序列化的字段"""
-    if hasattr(obj, "__dict__"):
-        result = {}
-        for key, value in obj.__dict__.items():
-            if key.startswith("-"):
-                continue
-            result[key] = serialize_value(value)
-        return result
-    elif isinstance(obj,(list,tuple)):
-        return [serialize_value(item) for item in obj]
-    elif isinstance(obj,dict):
-        return {k:serialize_value(v) for k,v in obj.items()}
-    else:
-        return str(obj)
+def _to_jsonable(obj):
+    """orjson 无法直接序列化的对象：有属性字典的转为字典，其余转为字符串"""
+    return obj.__dict__ if hasattr(obj, "__dict__") else str(obj)
 
-def serialize_value(value):
-    """递归序列化值"""
-    if hasattr(value,"__dict__"):
-        return serialize_response(value)
-    elif isinstance(value,(list, tuple)):
-        return [serialize_value(item) for item in value]
-    elif isinstance(value,dict):
-        return {k:serialize_value(v) for k,v in value.items()}
-    else:
-        try:
-            json.dumps(value)
-            return value
-        except (TypeError, ValueError):
-            return str(value)
-
-print(json.dumps(serialize_response(my_response),indent=2, ensure_ascii=False))
-    
\ No newline at end of file
+sys.stdout.buffer.write(orjson.dumps(
+    my_response,
+    default=_to_jsonable,
+    option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+))
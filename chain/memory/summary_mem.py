@@ -5,13 +5,19 @@ LastEditTime: 2025-12-24 09:58:29
 FilePath: /RAG_service/chain/memory/summary_mem.py
 Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查看配置 进行设置: https://github.com/OBKoro1/koro1FileHeader/wiki/%E9%85%8D%E7%BD%AE
 '''
+import sys
+import os
+
+# 添加项目根目录到Python路径，直接以脚本运行时也能导入 chain 包
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
 from langchain_community.chat_models import ChatTongyi
 from langchain.agents.middleware import SummarizationMiddleware
-from langchain_core.messages.utils import count_tokens_approximately
 from langchain.agents import create_agent
-from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+from chain.memory._tokens import cached_token_counter
 from dotenv import load_dotenv
-import os
+import sqlite3
 
 load_dotenv()
 
@@ -27,7 +33,8 @@ def get_weather(city:str) -> str:
 
 tools = [get_weather]
 
-checkpointer = InMemorySaver()
+# 对话检查点持久化到 SQLite，重启后可继续之前的会话
+checkpointer = SqliteSaver(sqlite3.connect("summary_mem.sqlite", check_same_thread=False))
 
 agent = create_agent(
     model=model,
@@ -35,7 +42,7 @@ agent = create_agent(
     middleware=[
          SummarizationMiddleware(
             model=model,
-            token_counter=count_tokens_approximately,
+            token_counter=cached_token_counter,
             trigger=("tokens", 368),        # 改为元组格式
             keep=("tokens", 128),           # 改为元组格式
             output_messages_key="messages",
@@ -1,24 +1,143 @@
+import sys
+import os
+
+# 添加项目根目录到Python路径，直接以脚本运行时也能导入 chain 包
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
 from tabnanny import check
 from langgraph.graph import StateGraph,MessagesState,START,END
 from langgraph.prebuilt import ToolNode
-from langchain_core.vectorstores import InMemoryVectorStore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.embeddings import DashScopeEmbeddings
 from langchain_core.documents import Document
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
-from langchain_core.messages.utils import get_buffer_string
-from typing import List
-import os
+from langchain_core.messages.utils import get_buffer_string, trim_messages
+from typing import DefaultDict, Deque, Dict, List, Optional, Tuple
+from functools import lru_cache
+from collections import OrderedDict, defaultdict, deque
+from urllib.parse import quote
+import atexit
 import uuid
 from dotenv import load_dotenv
 from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.prompts import ChatPromptTemplate,MessagesPlaceholder
 from langchain_community.chat_models.tongyi import ChatTongyi
-from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from chain.memory._embeddings import MicroBatchEmbeddings
+from chain.memory._tokens import cached_token_counter
+import asyncio
+from chain._aio import run_async
+import logging
+import threading
+import faiss
+import numpy as np
 
 load_dotenv()
 
-recall_vector_store = InMemoryVectorStore(DashScopeEmbeddings())
+logger = logging.getLogger(__name__)
+
+# HNSW 近似检索参数：M 为每个节点的邻居数，efConstruction/efSearch 为建图和检索时的候选集大小
+EMBEDDING_DIMENSION = 1536
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+HNSW_EF_SEARCH = 40
+
+# 检索记忆时只取最近对话，按 token 而不是字符截断
+MEMORY_QUERY_MAX_TOKENS = 256
+# 与已有记忆的相似度达到该值时视为重复，只更新原记忆
+DEDUP_SIMILARITY_THRESHOLD = 0.95
+
+# 用户分区持久化目录：{RECALL_STORE_PATH}/{user_id}/index.faiss，内存中最多保留的分区数
+RECALL_STORE_PATH = os.path.join("data", "hnsw")
+MAX_ACTIVE_PARTITIONS = 3
+
+# 对话记忆批量写入：DashScope 单次最多向量化 25 条文本
+SAVE_BATCH_SIZE = 16
+SAVE_BATCH_WAIT_SECONDS = 0.5
+
+# 所有用户分区共用一个向量化客户端，并发的异步检索请求合并为批量调用
+recall_embeddings = MicroBatchEmbeddings(DashScopeEmbeddings())
+
+def _new_recall_store() -> FAISS:
+    """创建 HNSW 索引的向量存储，向量归一化后按内积（即余弦相似度）检索。
+    向量按 int8 标量量化存储：归一化向量的分量都在 [-1, 1] 内，量化区间固定，无需训练数据
+    """
+    index = faiss.IndexHNSWSQ(
+        EMBEDDING_DIMENSION, faiss.ScalarQuantizer.QT_8bit_uniform, HNSW_M, faiss.METRIC_INNER_PRODUCT
+    )
+    index.train(np.array([[-1.0] * EMBEDDING_DIMENSION, [1.0] * EMBEDDING_DIMENSION], dtype=np.float32))
+    index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    index.hnsw.efSearch = HNSW_EF_SEARCH
+    return FAISS(
+        embedding_function=recall_embeddings,
+        index=index,
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        normalize_L2=True,
+        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+    )
+
+class PartitionedStore:
+    """记忆按用户分区存储，检索只扫描当前用户的向量。
+    内存中最多保留 max_active 个分区，超出时最久未使用的分区写回磁盘并释放，再次访问时从磁盘加载
+    """
+    def __init__(self, root: str = RECALL_STORE_PATH, max_active: int = MAX_ACTIVE_PARTITIONS):
+        self.root = root
+        self.max_active = max_active
+        # 记忆写入在线程池中执行，分区的加载、淘汰以及查重写入都需要互斥
+        self.lock = threading.RLock()
+        self._active: "OrderedDict[str, FAISS]" = OrderedDict()
+        self._dirty = set()
+
+    def _path(self, user_id: str) -> str:
+        return os.path.join(self.root, quote(user_id, safe=""))
+
+    def get(self, user_id: str, create: bool = True) -> Optional[FAISS]:
+        """获取用户分区；分区不存在时按 create 决定新建或返回 None"""
+        with self.lock:
+            store = self._active.get(user_id)
+            if store is not None:
+                self._active.move_to_end(user_id)
+                return store
+            path = self._path(user_id)
+            if os.path.exists(os.path.join(path, "index.faiss")):
+                store = FAISS.load_local(
+                    path,
+                    recall_embeddings,
+                    allow_dangerous_deserialization=True,
+                    normalize_L2=True,
+                    distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+                )
+                store.index.hnsw.efSearch = HNSW_EF_SEARCH
+            elif create:
+                store = _new_recall_store()
+            else:
+                return None
+            self._active[user_id] = store
+            while len(self._active) > self.max_active:
+                evicted_id, evicted = self._active.popitem(last=False)
+                if evicted_id in self._dirty:
+                    self._save(evicted_id, evicted)
+            return store
+
+    def mark_dirty(self, user_id: str) -> None:
+        with self.lock:
+            self._dirty.add(user_id)
+
+    def _save(self, user_id: str, store: FAISS) -> None:
+        store.save_local(self._path(user_id))
+        self._dirty.discard(user_id)
+
+    def save_all(self) -> None:
+        """将内存中有改动的分区写回磁盘"""
+        with self.lock:
+            for user_id in list(self._dirty):
+                self._save(user_id, self._active[user_id])
+
+recall_stores = PartitionedStore()
+atexit.register(recall_stores.save_all)
 
 model = ChatTongyi(
     model="qwen-turbo",
@@ -26,96 +145,148 @@ model = ChatTongyi(
     streaming=True
 )
 
-prompt = ChatPromptTemplate.from_messages([
-     ("system", """
+SYSTEM_PROMPT = """
     你是一个有记忆能力的助手。请根据用户的问题和下面提供的记忆内容回答。
     如果记忆中有相关信息，请利用这些信息来回答。
     如果需要保存新的记忆，请使用save_recall_memory工具。
     
     {recall_memory}
-    """),
-    MessagesPlaceholder(variable_name="messages")
-])
+    """
+
+@lru_cache(maxsize=128)
+def _system_message(recall_memories: Tuple[str, ...]) -> SystemMessage:
+    """按检索到的记忆缓存渲染好的系统消息，记忆不变时直接复用"""
+    return SystemMessage(content=SYSTEM_PROMPT.format(recall_memory="\n".join(recall_memories)))
 
 def get_user_id(config:RunnableConfig) -> str:
     """从RunnableConfig中提取用户ID"""
     return config["configurable"]["user_id"]
 
+def _insert_memories(user_id: str, memories: List[str]) -> None:
+    """一次请求向量化一批记忆后逐条写入；与已有记忆重复的只替换原文，不再新增向量"""
+    vectors = recall_embeddings.embed_documents(memories)
+    with recall_stores.lock:
+        store = recall_stores.get(user_id)
+        for memory, vector in zip(memories, vectors):
+            if store.index.ntotal:
+                matches = store.similarity_search_with_score_by_vector(vector, k=1)
+                if matches and matches[0][1] >= DEDUP_SIMILARITY_THRESHOLD:
+                    existing = matches[0][0]
+                    store.docstore.delete([existing.id])
+                    store.docstore.add({existing.id: Document(
+                        page_content=memory,
+                        id=existing.id,
+                        metadata=existing.metadata
+                    )})
+                    continue
+            store.add_embeddings(
+                [(memory, vector)],
+                metadatas=[{"user_id":user_id}],
+                ids=[str(uuid.uuid4())]
+            )
+        recall_stores.mark_dirty(user_id)
+
 @tool
 def save_recall_memory(memory:str,config:RunnableConfig) -> str:
     """将用户记忆保存到向量存储中"""
-    user_id = get_user_id(config)
-    document = Document(
-        page_content=memory,
-        id = str(uuid.uuid4()),
-        metadata={"user_id":user_id}
-    )
-    recall_vector_store.add_document([document])
+    _insert_memories(get_user_id(config), [memory])
     return memory
 
+def _search_memories(user_id: str, vector: List[float], k: int) -> List[str]:
+    """在用户分区中检索；HNSW 索引不支持检索与写入并发，与 _insert_memories 共用 recall_stores.lock"""
+    with recall_stores.lock:
+        store = recall_stores.get(user_id, create=False)
+        if store is None:
+            return []
+        documents = store.similarity_search_by_vector(vector, k=k)
+    return [doc.page_content for doc in documents]
+
 @tool
-def search_recall_memories(query:str,config:RunnableConfig) -> List[str]:
+async def search_recall_memories(query:str,config:RunnableConfig) -> List[str]:
     """检索用户记忆"""
     user_id = get_user_id(config)
-    def _filter_function(doc:Document) -> bool:
-        return doc.metadata.get("user_id") == user_id
-    documents = recall_vector_store.similarity_search(
-        query=query,
-        k=3,
-        filter=_filter_function
-    )
-    return [doc.page_content for doc in documents]
+    if recall_stores.get(user_id, create=False) is None:
+        return []
+    vector = await recall_embeddings.aembed_query(query)
+    return await asyncio.to_thread(_search_memories, user_id, vector, 3)
 
 class State(MessagesState):
     """对话状态"""
     recall_memories:List[str]
 
+# 工具绑定只需一次，所有轮次复用
+model_with_tools = model.bind_tools([save_recall_memory])
+
 def agent(state:State) -> State:
     """处理当前状态并生成回复"""
-    model_with_tools = model.bind_tools([save_recall_memory])
-
-    recall_str = ""
-    if "recall_memories" in state and state["recall_memories"]:
-        recall_str = "\n".join(state["recall_memories"])
-
-    response = prompt.invoke({
-        "messages":state["messages"],
-        "recall_memory": recall_str
-    })
-    prediction = model_with_tools.invoke(response)
+    system_message = _system_message(tuple(state.get("recall_memories") or ()))
+    prediction = model_with_tools.invoke([system_message, *state["messages"]])
 
     return {
         "messages": state["messages"] + [prediction]
     }
 
-def save_memory(state:State,config:RunnableConfig) -> State:
-    """保存当前对话内容到记忆中"""
+# 后台写入记忆的任务，保留引用防止任务被回收
+_pending_saves = set()
+# 按用户暂存待写入的记忆，攒满 SAVE_BATCH_SIZE 条或等待 SAVE_BATCH_WAIT_SECONDS 后批量写入
+_pending_memories: DefaultDict[str, Deque[str]] = defaultdict(deque)
+_flush_timers: Dict[str, asyncio.TimerHandle] = {}
+
+def _on_save_done(task: asyncio.Task) -> None:
+    _pending_saves.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("保存记忆失败：%s", task.exception())
+
+def _flush_memories(user_id: str) -> None:
+    """将用户暂存的记忆交给后台线程批量写入"""
+    timer = _flush_timers.pop(user_id, None)
+    if timer is not None:
+        timer.cancel()
+    pending = _pending_memories.pop(user_id, None)
+    if not pending:
+        return
+    task = asyncio.create_task(asyncio.to_thread(_insert_memories, user_id, list(pending)))
+    _pending_saves.add(task)
+    task.add_done_callback(_on_save_done)
+
+def _enqueue_memory(user_id: str, memory: str) -> None:
+    pending = _pending_memories[user_id]
+    pending.append(memory)
+    if len(pending) >= SAVE_BATCH_SIZE:
+        _flush_memories(user_id)
+    elif user_id not in _flush_timers:
+        _flush_timers[user_id] = asyncio.get_running_loop().call_later(
+            SAVE_BATCH_WAIT_SECONDS, _flush_memories, user_id
+        )
+
+async def wait_pending_saves() -> None:
+    """立即写入所有暂存的记忆，并等待后台写入完成"""
+    for user_id in list(_pending_memories):
+        _flush_memories(user_id)
+    if _pending_saves:
+        await asyncio.gather(*_pending_saves, return_exceptions=True)
+
+async def save_memory(state:State,config:RunnableConfig) -> State:
+    """保存当前对话内容到记忆中；记忆暂存后在后台批量写入，不阻塞本轮回复"""
+    # add_messages 已将输入统一转换为消息对象，本轮问答就是最后两条消息
     messages = state["messages"]
     if len(messages) >= 2:
-        user_msg = None
-        ai_msg = None
-
-        for msg in reversed(messages):
-            if hasattr(msg, "role"):
-                if msg.role == "user" and user_msg is None:
-                    user_msg = msg.content
-                elif msg.role == "assistant" and user_msg is None:
-                    user_msg = msg.get("content", "")
-            elif isinstance(msg,dict):
-                if msg.get("role") == "user" and user_msg is None:
-                    user_msg = msg.get("content", "")
-                elif msg.get('role') == "assistant" and ai_msg is None:
-                    ai_msg = msg.get("content", "")
-        
-        if user_msg and ai_msg:
-            memory_content = f"用户问：{user_msg}\n助手答：{ai_msg}"
-            save_recall_memory.invoke(memory_content,config)
+        user_msg, ai_msg = messages[-2], messages[-1]
+        if user_msg.type == "human" and ai_msg.type == "ai" and ai_msg.content:
+            memory_content = f"用户问：{user_msg.content}\n助手答：{ai_msg.content}"
+            _enqueue_memory(get_user_id(config), memory_content)
     return {}
 
-def load_memories(state:State,config:RunnableConfig) -> State:
-    convo_str = get_buffer_string(state["messages"])
-    convo_str = convo_str[:800]
-    recall_memories = search_recall_memories.invoke(convo_str,config)
+async def load_memories(state:State,config:RunnableConfig) -> State:
+    messages = state["messages"]
+    recent = trim_messages(
+        messages,
+        strategy="last",
+        token_counter=cached_token_counter,
+        max_tokens=MEMORY_QUERY_MAX_TOKENS
+    ) or messages[-1:]  # 最后一条消息本身超出预算时仍用它检索
+    convo_str = get_buffer_string(recent)
+    recall_memories = await search_recall_memories.ainvoke(convo_str,config)
     return {
         "recall_memories":recall_memories
     }
@@ -123,7 +294,7 @@ def load_memories(state:State,config:RunnableConfig) -> State:
 def route_tools(state:State,config:RunnableConfig) -> State:
     """根据最后一条信息决定下一步操作"""
     msg = state["messages"][-1]
-    if msg.tool_calls:  # 修复拼写错误：too_calls -> tool_calls
+    if isinstance(msg, AIMessage) and msg.tool_calls:
         return "tools"
     return END
 
@@ -165,17 +336,24 @@ def get_stream_chunk(chunk):
         if "recall_memories" in update and update["recall_memories"]:
             print(f"[检索到的记忆]{update['recall_memories']}")
 
-for chunk in graph.stream(
-    {"messages": [{
-        "role":"user",
-        "content": "我喜欢吃苹果"
-    }]},
-    config=config  # 移除冗余的 config = config
-):
-    get_stream_chunk(chunk)
-
-for chunk in graph.stream(
-    {"messages": [{"role": "user", "content": "我喜欢吃什么"}]},
-    config=config
-):
-    get_stream_chunk(chunk)
\ No newline at end of file
+async def main():
+    async for chunk in graph.astream(
+        {"messages": [{
+            "role":"user",
+            "content": "我喜欢吃苹果"
+        }]},
+        config=config  # 移除冗余的 config = config
+    ):
+        get_stream_chunk(chunk)
+
+    async for chunk in graph.astream(
+        {"messages": [{"role": "user", "content": "我喜欢吃什么"}]},
+        config=config
+    ):
+        get_stream_chunk(chunk)
+
+    await wait_pending_saves()
+
+# 仅直接运行时执行示例，导入本模块不会发起模型调用
+if __name__ == "__main__":
+    run_async(main())
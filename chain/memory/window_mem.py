@@ -5,17 +5,19 @@ LastEditTime: 2025-12-24 10:44:28
 FilePath: /RAG_service/chain/memory/window_mem.py
 Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查看配置 进行设置: https://github.com/OBKoro1/koro1FileHeader/wiki/%E9%85%8D%E7%BD%AE
 '''
+import sys
 import os
+
+# 添加项目根目录到Python路径，直接以脚本运行时也能导入 chain 包
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
 from dotenv import load_dotenv
-from langchain_core.messages.utils import (
-    trim_messages,
-    count_tokens_approximately
-)
 from langchain.agents import create_agent
 from langchain.agents.middleware import AgentMiddleware, before_model
 from langgraph.checkpoint.memory import InMemorySaver
 from langchain_community.chat_models.tongyi import ChatTongyi
 from langchain_core.tools import tool
+from chain.memory._tokens import cached_token_counter
 
 load_dotenv()
 
@@ -33,19 +35,29 @@ def get_weather(city: str) -> str:
 
 tools = [get_weather]
 
+# 窗口大小限制（以token计算）
+WINDOW_MAX_TOKENS = 384
+
+def trim_window(messages):
+    """保留最近不超过 WINDOW_MAX_TOKENS 的消息：先算出总量，再从最早的消息开始逐条移除，
+    直到满足预算且以人类消息开头；末尾只保留到人类或工具消息
+    """
+    messages = list(messages)
+    while messages and messages[-1].type not in ("human", "tool"):
+        messages.pop()
+    total = cached_token_counter(messages)
+    start = 0
+    while start < len(messages) and (total > WINDOW_MAX_TOKENS or messages[start].type != "human"):
+        total -= cached_token_counter([messages[start]])
+        start += 1
+    return messages[start:]
+
 # 创建自定义中间件，用于修剪消息历史
 @before_model
 def trim_messages_middleware(state, config):  # 接受两个参数
     """修剪消息历史，保持最近的384个token"""
     return {
-        "llm_input_messages": trim_messages(
-            state["messages"],
-            strategy="last",  # 保留最后的消息（最新的消息）
-            token_counter=count_tokens_approximately,
-            max_tokens=384,  # 窗口大小限制（以token计算）
-            start_on="human",  # 确保从人类消息开始
-            end_on=("human", "tool"),  # 在人类或工具消息结束
-        )
+        "llm_input_messages": trim_window(state["messages"])
     }
 
 checkpointer = InMemorySaver()  # 修正变量名
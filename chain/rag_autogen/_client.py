@@ -0,0 +1,49 @@
+'''
+Description: rag_autogen 示例共享的 DashScope 模型客户端，底层复用 chain._http 的连接池
+'''
+import os
+from functools import lru_cache
+
+import httpx
+from dotenv import load_dotenv
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+from chain._http import DASHSCOPE_BASE_URL, HTTP_TIMEOUT, get_async_transport
+
+load_dotenv()
+
+model_info_qwen_plus = {
+    "model_name": "qwen-plus",
+    "family": "qwen",
+    "context_length": 32000,
+    "vision": False,
+    "function_calling": True,
+    "json_output": True,
+    "structured_output": True
+}
+
+class _BorrowedAsyncClient(httpx.AsyncClient):
+    """借用共享连接池的 httpx 客户端：关闭操作为空，连接池归 chain._http 所有，不随某个模型客户端关闭"""
+
+    async def aclose(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "_BorrowedAsyncClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        pass
+
+@lru_cache(maxsize=None)
+def get_model_client(parallel_tool_calls: bool = False) -> OpenAIChatCompletionClient:
+    """按是否并行调用工具缓存客户端，同一进程内的所有智能体共用一个实例。
+    返回的客户端为进程共享，调用方不要关闭；按 AutoGen 惯例调用 close() 也只是空操作，不会断开其他请求的连接池
+    """
+    return OpenAIChatCompletionClient(
+        model="qwen-plus",
+        base_url=DASHSCOPE_BASE_URL,
+        api_key=os.getenv("DASHSCOPE_API_KEY"),
+        model_info=model_info_qwen_plus,
+        parallel_tool_calls=parallel_tool_calls,
+        http_client=_BorrowedAsyncClient(transport=get_async_transport(), timeout=HTTP_TIMEOUT)
+    )
@@ -1,48 +1,49 @@
-import asyncio
+import sys
 import os
+
+# 添加项目根目录到Python路径，直接以脚本运行时也能导入 chain 包
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import asyncio
+from chain._aio import run_async
+from typing import List
 from dotenv import load_dotenv
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+from chain.rag_autogen._client import get_model_client
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.teams import RoundRobinGroupChat
 from autogen_agentchat.conditions import HandoffTermination, MaxMessageTermination
 from autogen_core import CancellationToken
 from autogen_agentchat.ui import Console
 from autogen_agentchat.messages import HandoffMessage
+from autogen_agentchat.base import TaskResult
 
 load_dotenv()
 
-model_info_qwen_plus = {
-    "model_name": "qwen-plus", 
-    "family": "qwen",
-    "context_length": 32000,
-    "vision": False,
-    "function_calling": True,
-    "json_output": True,
-    "structured_output": True
-}
-
-model_client = OpenAIChatCompletionClient(
-    model="qwen-plus",
-    base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    model_info=model_info_qwen_plus,
-    parallel_tool_calls = False
-)
+model_client = get_model_client()
 
-async def main() -> None:
-    try:
-        agent1 = AssistantAgent(
-            "Assistant_1",
-            model_client=model_client,
-        )
-        agent2=AssistantAgent("Assistant_2", model_client=model_client)
+def create_team() -> RoundRobinGroupChat:
+    """创建一个双助手轮询团队，所有团队共享同一个 model_client"""
+    agent1 = AssistantAgent(
+        "Assistant_1",
+        model_client=model_client,
+    )
+    agent2=AssistantAgent("Assistant_2", model_client=model_client)
 
-        termination = MaxMessageTermination(10)
+    termination = MaxMessageTermination(10)
 
-        team = RoundRobinGroupChat(
-            [agent1, agent2],
-            termination_condition=termination,
-        )
+    return RoundRobinGroupChat(
+        [agent1, agent2],
+        termination_condition=termination,
+    )
+
+async def run_batch_async(tasks: List[str]) -> List[TaskResult]:
+    """并发执行多个任务：每个任务使用独立的团队，对话状态互不影响，总耗时约为最慢的一个任务"""
+    teams = [create_team() for _ in tasks]
+    return await asyncio.gather(*(team.run(task=task) for team, task in zip(teams, tasks)))
+
+async def main() -> None:
+    try:
+        team = create_team()
         
         print("开始第一次计算任务...")
         try:
@@ -93,4 +94,4 @@ async def main() -> None:
 
     
 
-asyncio.run(main())
\ No newline at end of file
+run_async(main())
\ No newline at end of file
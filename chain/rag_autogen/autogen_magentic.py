@@ -6,11 +6,16 @@ LastEditTime: 2025-12-18 14:46:53
 FilePath: /RAG_service/chain/rag_autogen/autogen_magentic.py
 Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查看配置 进行设置: https://github.com/OBKoro1/koro1FileHeader/wiki/%E9%85%8D%E7%BD%AE
 '''
-import asyncio
+import sys
 import os
+
+# 添加项目根目录到Python路径，直接以脚本运行时也能导入 chain 包
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from chain._aio import run_async
 from dotenv import load_dotenv
 from typing import Sequence
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+from chain.rag_autogen._client import get_model_client
 from autogen_agentchat.agents import AssistantAgent, UserProxyAgent
 from autogen_agentchat.teams import RoundRobinGroupChat, SelectorGroupChat, MagenticOneGroupChat
 from autogen_agentchat.conditions import TextMentionTermination, MaxMessageTermination
@@ -21,23 +26,7 @@ from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage
 
 load_dotenv()
 
-model_info_qwen_plus = {
-    "model_name": "qwen-plus", 
-    "family": "qwen",
-    "context_length": 32000,
-    "vision": False,
-    "function_calling": True,
-    "json_output": True,
-    "structured_output": True
-}
-
-model_client = OpenAIChatCompletionClient(
-    model="qwen-plus",
-    base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    model_info=model_info_qwen_plus,
-    parallel_tool_calls = False
-)
+model_client = get_model_client()
 
 async def main():
     assistant = AssistantAgent(
@@ -52,4 +41,4 @@ async def main():
         task="给费马大定理一个不同的证明"
     ))
     
-asyncio.run(main())
\ No newline at end of file
+run_async(main())
\ No newline at end of file
@@ -1,4 +1,10 @@
-import asyncio
+import sys
+import os
+
+# 添加项目根目录到Python路径，直接以脚本运行时也能导入 chain 包
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from chain._aio import run_async
 
 from dataclasses import dataclass
 from typing import Callable
@@ -53,4 +59,4 @@ async def main():
     await runtime.send_message(Message(10), AgentId('checker', "default"))
     await runtime.stop_when_idle()
 
-asyncio.run(main())
\ No newline at end of file
+run_async(main())
\ No newline at end of file
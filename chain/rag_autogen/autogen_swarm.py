@@ -6,10 +6,15 @@ LastEditTime: 2025-12-18 08:09:29
 FilePath: /RAG_service/chain/rag_autogen/autogen_dom.py
 Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查看配置 进行设置: https://github.com/OBKoro1/koro1FileHeader/wiki/%E9%85%8D%E7%BD%AE
 '''
-import asyncio
+import sys
 import os
+
+# 添加项目根目录到Python路径，直接以脚本运行时也能导入 chain 包
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from chain._aio import run_async
 from dotenv import load_dotenv
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+from chain.rag_autogen._client import get_model_client
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.teams import Swarm
 from autogen_agentchat.conditions import HandoffTermination, MaxMessageTermination
@@ -18,25 +23,10 @@ from autogen_agentchat.messages import HandoffMessage
 
 load_dotenv()
 
-model_info_qwen_plus = {
-    "model_name": "qwen-plus", 
-    "family": "qwen",
-    "context_length": 32000,
-    "vision": False,
-    "function_calling": True,
-    "json_output": True,
-    "structured_output": True
-}
-
 
 async def main():
-    model_client = OpenAIChatCompletionClient(
-        model="qwen-plus",
-        base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-        api_key=os.getenv("DASHSCOPE_API_KEY"),
-        model_info=model_info_qwen_plus,
-        parallel_tool_calls = False
-    )
+    # Swarm 依赖 handoff 工具切换发言者，并行调用可能同时触发多个 handoff，保持串行
+    model_client = get_model_client()
 
     agent = AssistantAgent(
         "Alice",
@@ -58,4 +48,4 @@ async def main():
             task=HandoffMessage(source="user", target="Alice", content="Bob's birthday is on 1st January.")
         )
     )
-asyncio.run(main())
\ No newline at end of file
+run_async(main())
\ No newline at end of file
@@ -6,9 +6,15 @@ LastEditTime: 2025-12-23 15:29:13
 FilePath: /RAG_service/chain/rag_autogen/tag_autogenChat.py
 Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查看配置 进行设置: https://github.com/OBKoro1/koro1FileHeader/wiki/%E9%85%8D%E7%BD%AEfrom
 '''
+import sys
 import os
+
+# 添加项目根目录到Python路径，直接以脚本运行时也能导入 chain 包
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
 import logging
 import asyncio
+from chain._aio import run_async
 from autogen_core import EVENT_LOGGER_NAME
 
 logging.basicConfig(level=logging.WARNING)
@@ -16,28 +22,13 @@ logger = logging.getLogger(EVENT_LOGGER_NAME)
 logger.addHandler(logging.StreamHandler())
 logger.setLevel(logging.INFO)
 
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+from chain.rag_autogen._client import get_model_client
 from autogen_core.models import UserMessage
 from autogen_agentchat.messages import TextMessage
 from dotenv import load_dotenv
 load_dotenv()
 
-model_info_qwen_plus = {
-    "model_name": "qwen-plus", 
-    "family": "qwen",
-    "context_length": 32000,
-    "vision": False,
-    "function_calling": True,
-    "json_output": True,
-    "structured_output": True
-}
-
-model_client = OpenAIChatCompletionClient(
-        model="qwen-plus",
-        base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-        api_key=os.getenv("DASHSCOPE_API_KEY"),
-        model_info=model_info_qwen_plus
-    )
+model_client = get_model_client()
 
 text_message = TextMessage(content="Hello, world!", source="User")
 
@@ -65,13 +56,6 @@ from autogen_core import CancellationToken
 
 # fetch_mcp_server = StdioServerParams(command="uvx", args=["mcp-server-fetch"])
 
-model_client = OpenAIChatCompletionClient(
-    model="qwen-plus",
-    base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    model_info=model_info_qwen_plus
-)
-
 async def main():
     # 初始化两个智能体进行对话
     assistant1 = AssistantAgent("assistant1", model_client=model_client, system_message="你是一个诗人，请创作一首关于海洋的四行诗。")
@@ -83,16 +67,13 @@ async def main():
     # 创建团队
     team = RoundRobinGroupChat([assistant1, assistant2], termination_condition=termination, max_turns=5)
     
-    try:
-        # 运行任务
-        result = await team.run(task="写一首关于海洋的四行诗并评估")
-        print("结果:", result)
-    finally:
-        # 确保关闭模型客户端
-        await model_client.close()
+    # 运行任务
+    # model_client 来自 get_model_client()，底层是进程级共享的 httpx 连接池，不归本模块所有，这里不关闭
+    result = await team.run(task="写一首关于海洋的四行诗并评估")
+    print("结果:", result)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
 
 # # 创建“主创”智能体（负责生成初始内容）
 # primary_agent = AssistantAgent(
@@ -1,14 +1,33 @@
+import sys
+import os
+
+# 添加项目根目录到Python路径，直接以脚本运行时也能导入 chain 包
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from dotenv import load_dotenv
 from langchain_community.chat_models import  ChatTongyi
 from langchain_community.document_loaders import WebBaseLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import SKLearnVectorStore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.embeddings import DashScopeEmbeddings
+from langchain_community.cache import SQLiteCache
+import hashlib
 import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List
+from langchain_core.embeddings import Embeddings
 from langchain_core.messages import HumanMessage, SystemMessage
+from chain.llm_cache import SemanticLLMCache
+import faiss
 
 load_dotenv()
 
+# LLM 缓存：完全相同的提示词命中 SQLite 精确缓存，上下文相同、问题语义相近时命中语义缓存
+LLM_CACHE_PATH = os.getenv("RAG_LANGGRAPH_LLM_CACHE_PATH", ".rag_langgraph_llm.db")
+
 
 urls = [
     "https://lilianweng.github.io/posts/2023-06-23-agent/",  # AI代理相关文章
@@ -16,47 +35,140 @@ urls = [
     "https://lilianweng.github.io/posts/2023-10-25-adv-attack-llm/",  # LLM对抗攻击文章
 ]
 
-llm = ChatTongyi(
-    model_name="qwen-turbo",
-    temperature=0.7,
-    streaming=True
-)
-llm_json_mode = ChatTongyi(
-    model_name="qwen-turbo",
-    temperature=0.7,
-    streaming=True,
-    format="json"
-)
-
-# 使用自定义请求头创建 WebBaseLoader
-docs = [WebBaseLoader(
-    web_paths=[url],
-        requests_kwargs={
-            "headers": {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            },
-            "timeout": 30  # 添加超时避免挂起
-        }
-).load() for url in urls]
-
-docs_list = [item for sublist in docs for item in sublist]
-
-
-text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-    chunk_size = 1000,
-    chunk_overlap = 200
-)
-
-doc_splits = text_splitter.split_documents(docs_list)
-
-vectorstore = SKLearnVectorStore.from_documents(
-    documents = doc_splits,
-    embedding = DashScopeEmbeddings(model="text-embedding-v3")
-)
-
-retriever = vectorstore.as_retriever(k=3)
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+EMBEDDING_MODEL = "text-embedding-v3"
+# text-embedding-v3 单次请求最多 10 条文本，最多同时发出 4 个请求以免触发限流
+EMBED_BATCH_SIZE = 10
+EMBED_CONCURRENCY = 4
+# HNSW 近似检索参数：M 为每个节点的邻居数，efConstruction/efSearch 为建图和检索时的候选集大小
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+# 向量库持久化目录（FAISS save_local 格式），meta.json 记录构建参数的指纹
+RETRIEVER_CACHE_DIR = os.getenv("RAG_LANGGRAPH_INDEX_DIR", os.path.join("data", "rag_langgraph"))
+
+@lru_cache(maxsize=1)
+def get_llm_cache() -> SemanticLLMCache:
+    """只挂在本模块的模型上，不通过 set_llm_cache 影响进程内的其他模型"""
+    return SemanticLLMCache(
+        DashScopeEmbeddings(model="text-embedding-v3"),
+        exact_cache=SQLiteCache(database_path=LLM_CACHE_PATH)
+    )
+
+@lru_cache(maxsize=1)
+def get_llm() -> ChatTongyi:
+    return ChatTongyi(
+        model_name="qwen-turbo",
+        temperature=0.7,
+        streaming=True,
+        cache=get_llm_cache()
+    )
+
+@lru_cache(maxsize=1)
+def get_llm_json_mode() -> ChatTongyi:
+    return ChatTongyi(
+        model_name="qwen-turbo",
+        temperature=0.7,
+        streaming=True,
+        format="json",
+        cache=get_llm_cache()
+    )
+
+class BatchedEmbeddings(Embeddings):
+    """文档向量化按接口上限分批，多批并发请求；查询向量直接透传"""
+    def __init__(self, embeddings: Embeddings, batch_size: int = EMBED_BATCH_SIZE, concurrency: int = EMBED_CONCURRENCY):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results = executor.map(self.embeddings.embed_documents, batches)
+            return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+def _load_documents():
+    """下载文章并切分为文档块"""
+    # 使用自定义请求头创建 WebBaseLoader；各文章互不依赖，并发下载，总耗时取最慢的一篇
+    loaders = [WebBaseLoader(
+        web_paths=[url],
+            requests_kwargs={
+                "headers": {
+                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+                },
+                "timeout": 30  # 添加超时避免挂起
+            }
+    ) for url in urls]
+    with ThreadPoolExecutor(max_workers=len(loaders)) as executor:
+        docs = list(executor.map(lambda loader: loader.load(), loaders))
+
+    docs_list = [item for sublist in docs for item in sublist]
+
+    text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        chunk_size = CHUNK_SIZE,
+        chunk_overlap = CHUNK_OVERLAP
+    )
+
+    return text_splitter.split_documents(docs_list)
+
+def _pipeline_fingerprint() -> str:
+    """文章列表、切分参数、向量模型或索引类型变化时，已保存的向量库失效"""
+    payload = json.dumps([urls, CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL, "faiss-hnsw", HNSW_M])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def _build_vectorstore(embedding: Embeddings) -> FAISS:
+    """向量化文档块并写入 HNSW 索引；向量归一化后按内积（即余弦相似度）检索"""
+    doc_splits = _load_documents()
+    texts = [doc.page_content for doc in doc_splits]
+    vectors = embedding.embed_documents(texts)
+
+    index = faiss.IndexHNSWFlat(len(vectors[0]), HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    index.hnsw.efSearch = HNSW_EF_SEARCH
+    vectorstore = FAISS(
+        embedding_function=embedding,
+        index=index,
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        normalize_L2=True,
+        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+    )
+    vectorstore.add_embeddings(zip(texts, vectors), metadatas=[doc.metadata for doc in doc_splits])
+    return vectorstore
+
+@lru_cache(maxsize=1)
+def get_retriever():
+    """首次运行下载、切分并向量化文章后保存到磁盘，之后直接加载，每个进程只构建一次"""
+    embedding = BatchedEmbeddings(DashScopeEmbeddings(model=EMBEDDING_MODEL))
+    meta_path = os.path.join(RETRIEVER_CACHE_DIR, "meta.json")
+    fingerprint = _pipeline_fingerprint()
+
+    cached_fingerprint = None
+    if os.path.exists(os.path.join(RETRIEVER_CACHE_DIR, "index.faiss")) and os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            cached_fingerprint = json.load(f).get("fingerprint")
+
+    if cached_fingerprint == fingerprint:
+        vectorstore = FAISS.load_local(
+            RETRIEVER_CACHE_DIR,
+            embedding,
+            allow_dangerous_deserialization=True,
+            normalize_L2=True,
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+        )
+        vectorstore.index.hnsw.efSearch = HNSW_EF_SEARCH
+    else:
+        os.makedirs(RETRIEVER_CACHE_DIR, exist_ok=True)
+        vectorstore = _build_vectorstore(embedding)
+        vectorstore.save_local(RETRIEVER_CACHE_DIR)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint}, f)
 
-print('retriever', retriever)
+    return vectorstore.as_retriever(search_kwargs={"k": 3})
 
 # 定义路由的系统指令，用于决定问题应该路由到向量存储还是网络搜索
 router_instructions = """You are an expert at routing a user question to a vectorstore or web search.
@@ -67,10 +179,20 @@ Use the vectorstore for questions on these topics. For all else, and especially
 
 Return JSON with single key, datasource, that is 'websearch' or 'vectorstore' depending on the question."""
 
-test_web_search = llm_json_mode.invoke([SystemMessage(content=router_instructions)]  # 系统消息包含路由指令
-    + [
-        HumanMessage(
-            content="Who is favored to win the NFC Championship game in the 2024 season?"  # 询问2024赛季NFC冠军赛的热门球队
-        )
-    ]
-)
\ No newline at end of file
+def _demo():
+    retriever = get_retriever()
+
+    print('retriever', retriever)
+
+    test_web_search = get_llm_json_mode().invoke([SystemMessage(content=router_instructions)]  # 系统消息包含路由指令
+        + [
+            HumanMessage(
+                content="Who is favored to win the NFC Championship game in the 2024 season?"  # 询问2024赛季NFC冠军赛的热门球队
+            )
+        ]
+    )
+    print('test_web_search', test_web_search.content)
+
+# 仅直接运行时执行示例，导入本模块不会触发下载、向量化或模型调用
+if __name__ == "__main__":
+    _demo()
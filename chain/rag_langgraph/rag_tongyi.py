@@ -6,36 +6,43 @@ LastEditTime: 2025-12-16 08:30:47
 FilePath: /RAG_service/chain/rag_langgraph/rag_tongyi.py
 Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查看配置 进行设置: https://github.com/OBKoro1/koro1FileHeader/wiki/%E9%85%8D%E7%BD%AErom langchain_community.chat
 '''
-import re
-from typing import Annotated, Sequence, Literal
+from itertools import islice
+from typing import Annotated, Iterator, Sequence, Literal
 from typing_extensions import TypedDict
 import operator
 
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.graph import StateGraph, START , END, add_messages
 from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import StateSnapshot
 from pydantic import BaseModel, Field
 
+# 示例中最多打印的历史快照数
+HISTORY_PRINT_LIMIT = 20
+
 class GraphState(TypedDict):
     messages: Annotated[Sequence ,add_messages]
     retry_count: int
+    # 去除首尾空白后的最新输入，由 normalize_input / receive_input 写入，后续节点直接读取
+    normalized_input: str
 
 def is_valid_order_id(text: str) -> bool:
-    return  bool(re.fullmatch(r"\d{10,12}", text))
+    """10 到 12 位 ASCII 数字；isdigit 还会接受全角数字、上标等 Unicode 数字，需先限定 ASCII"""
+    return 10 <= len(text) <= 12 and text.isascii() and text.isdigit()
+
+def normalize_input(state: GraphState):
+    return {"normalized_input": state["messages"][-1].content.strip()}
 
 def validate_input(state: GraphState) -> Literal['valid', 'invalid']:
-    last_message = state["messages"][-1]
-    user_input = last_message.content.strip()
-    if is_valid_order_id(user_input):
+    if is_valid_order_id(state["normalized_input"]):
         return 'valid'
     return 'invalid'
 
 def receive_input(state: GraphState):
-    user_input = state["messages"][-1].content.strip()
-    return {"order_id": user_input}
+    return normalize_input(state)
 
 def query_order(state: GraphState):
-    order_id = state["messages"][-1].content.strip()    
+    order_id = state["normalized_input"]
     print(f"查询订单: {order_id}")
     return {
         "messages": [AIMessage(content="订单状态: 已发货")],
@@ -52,12 +59,15 @@ def handle_invalid(state:GraphState):
 
 builder = StateGraph(GraphState)
 
+builder.add_node('normalize_input',normalize_input)
 builder.add_node('receive_input',receive_input)
 builder.add_node('query_order',query_order)
 builder.add_node('handle_invalid',handle_invalid)
 
+# 条件边的路由函数不能写入状态，先由 normalize_input 节点计算一次规整后的输入
+builder.add_edge(START, 'normalize_input')
 builder.add_conditional_edges(
-    START,
+    'normalize_input',
     validate_input,
     {
         'valid': 'query_order',
@@ -77,23 +87,41 @@ memory_saver = MemorySaver()
 
 app = builder.compile(checkpointer = memory_saver)
 
-config = {
-    "configurable": {
-        "thread_id": "1"
+def print_state_history(history: Iterator[StateSnapshot], limit: int = HISTORY_PRINT_LIMIT):
+    """按从新到旧的顺序打印最近 limit 个快照。
+    较早快照的消息是较新快照的前缀，每个快照只打印相对其前一个（更早的）快照新增的消息，
+    不重复输出累积的完整消息列表；快照逐个读取，不一次性取出全部历史
+    """
+    snapshots = islice(history, limit + 1)
+    snapshot = next(snapshots, None)
+    for _ in range(limit):
+        if snapshot is None:
+            break
+        parent = next(snapshots, None)
+        messages = snapshot.values.get("messages", [])
+        prev_len = len(parent.values.get("messages", [])) if parent is not None else 0
+        print("New messages:", messages[prev_len:])
+        print("Retry count:", snapshot.values.get("retry_count", 0))
+        print("---")
+        snapshot = parent
+
+def _demo():
+    config = {
+        "configurable": {
+            "thread_id": "1"
+        }
     }
-}
 
-response = app.invoke(
-    {"messages": [HumanMessage(content="123")]},
-    config=config,
-)
+    response = app.invoke(
+        {"messages": [HumanMessage(content="123")]},
+        config=config,
+    )
 
-history = app.get_state_history(config)
+    print_state_history(app.get_state_history(config))
 
-for snapshot in history:
-    print("Messages:", snapshot.values["messages"])
-    print("Retry count:", snapshot.values.get("retry_count", 0))
-    print("---")
+# 仅直接运行时执行示例，导入本模块只构建图
+if __name__ == "__main__":
+    _demo()
 
 # class AgentState(BaseModel):
 #     messages: Annotated[Sequence[str], operator.add] = Field(default_factory=list)
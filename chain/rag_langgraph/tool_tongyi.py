@@ -1,6 +1,11 @@
+import hashlib
 import importlib.util
 import os
-from typing import TypeDict, Dict, Callable
+import sys
+from typing import TypedDict, Dict, Callable, Tuple
+
+# 已加载的工具模块：文件绝对路径 -> (修改时间, 模块中的工具)
+_TOOL_CACHE: Dict[str, Tuple[int, Dict[str, Callable]]] = {}
 
 def tool(name:str,description:str = ""):
     def decorator(func):
@@ -10,10 +15,30 @@ def tool(name:str,description:str = ""):
         return func
     return decorator
 
+def _load_module_tools(file_path: str, module_name: str) -> Dict[str, Callable]:
+    """执行工具模块并收集其中带 is_tool 标记的函数"""
+    tools = {}
+    spec = importlib.util.spec_from_file_location(module_name, file_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except Exception:
+        sys.modules.pop(module_name, None)
+        raise
+
+    # 扫描模块中的工具函数
+    for attr_name in dir(module):
+        obj = getattr(module, attr_name)
+        if hasattr(obj, "is_tool"):
+            tools[obj.tool_name] = obj
+            print(f" 发现工具: {obj.tool_name} ({obj.description})")
+    return tools
+
 def load_tools_from_directory(tools_dir: str) -> Dict[str, Callable]:
     """
     动态工具加载器 - 运行时扫描目录
-    与静态加载的核心区别
+    与静态加载的核心区别：文件修改时间未变的模块直接复用上次加载的工具，只有新增或修改的文件会重新执行
     """
     tools = {}
 
@@ -24,25 +49,29 @@ def load_tools_from_directory(tools_dir: str) -> Dict[str, Callable]:
 
     print(f"扫描工具目录：{tools_dir}")
 
-    for filename in os.listdir(tools_dir):
-        if filename.endswith('.py') and not filename.startswith("__"):
-            file_path = os.path.join(tool_dir, filename)
-            module_name = filename[:-3]
-
+    with os.scandir(tools_dir) as entries:
+        for entry in entries:
+            filename = entry.name
+            if not (filename.endswith('.py') and not filename.startswith("__") and entry.is_file()):
+                continue
+            file_path = os.path.abspath(entry.path)
+            mtime = entry.stat().st_mtime_ns
+
+            cached = _TOOL_CACHE.get(file_path)
+            if cached is not None and cached[0] == mtime:
+                tools.update(cached[1])
+                continue
+
+            # 不同目录下可能有同名模块，按文件路径生成唯一的模块名
+            module_name = f"_dynamic_tools_{hashlib.sha1(file_path.encode('utf-8')).hexdigest()[:12]}_{filename[:-3]}"
             try:
                 # 动态导入模块
-                spec = importlib.util.spec_from_file_location(module_name, file_path)
-                module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module)
-
-                # 扫描模块中的工具函数
-                for attr_name in dir(module):
-                    obj = getattr(module, attr_name)
-                    if hasattr(obj, "is_tool"):
-                        tools[obj.tool_name] = obj
-                        print(f" 发现工具: {obj.tool_name} ({obj.description})")
+                module_tools = _load_module_tools(file_path, module_name)
             except Exception as e:
-                print(f" 加载工具模块 {module_name} 失败: {e}")
+                print(f" 加载工具模块 {filename[:-3]} 失败: {e}")
+                continue
+            _TOOL_CACHE[file_path] = (mtime, module_tools)
+            tools.update(module_tools)
 
     return tools
 
@@ -75,7 +104,7 @@ def load_tools_by_config(config:dict) -> Dict[str, Callable]:
 
     return tools
 
-class AgentState(TypeDict):
+class AgentState(TypedDict):
     task: str
     tools: dict
     result: str
@@ -87,31 +116,8 @@ def dynamic_load_tools_node(state: AgentState) -> AgentState:
     """
     customer_id = state.get("customer_id", "default")
 
-    # 通用工具目录加载，运行时扫描
-    general_tools = load-tools_from_directory("tools/")
-
-    # 从客户专属目录加载
-    customer_tools = load_tools_by_config(customer_id)
-
-    # 根据配置加载
-    config = {
-        "enabled_tools": [
-            {
-                "directory": "tools/",
-                "tools": ["calculator", "text_processor"]
-            },
-            {
-                "directory": f"customers/{customer_id}/tools/"
-            }
-        ]
-    }
-
-    config_tools = load_tools_by_config(config)
-
-    all_tools = {}
-    all_tools.update(general_tools)
-    all_tools.update(customer_tools)
-    all_tools.update(config_tools)
+    # 通用工具目录与客户专属目录各扫描一次，同名工具以客户专属版本为准
+    all_tools = {**load_tools_from_directory("tools/"), **load_customer_tools(customer_id)}
 
     state["tools"] = all_tools
     print(f" 动态加载完成，共 {len(all_tools)} 个工具: {list(all_tools.keys())}")
@@ -17,26 +17,50 @@ from langchain_classic.agents import create_react_agent
 from langchain_classic.agents import AgentExecutor
 from langchain_core.prompts import PromptTemplate
 from langchain_core.tools import Tool
+from langchain_core.callbacks import StreamingStdOutCallbackHandler
+from langchain_community.cache import SQLiteCache
 from dotenv import load_dotenv
+from functools import lru_cache
 import logging
+import os
 
 # 初始化环境变量
 load_dotenv()
 
+# LLM 缓存：Tongyi 是文本补全模型，ReAct 提示词是整段纯文本，无法拆出单条问题做语义匹配，
+# 只用 SQLite 精确缓存，完全相同的推理步骤直接命中；缓存只挂在本模块的模型上，不设置进程全局缓存
+LLM_CACHE_PATH = os.getenv("RE_ACT_LLM_CACHE_PATH", ".re_act_llm.db")
+
 # 物流场景mock工具
 
+# mock 数据与对应的工具返回文本，模块加载时生成一次
+_TRACKING_RESPONSES = {
+    "SF123456": "当前物流信息: [2024-05-20 10:30] 已签收，签收人: 张三；[2024-05-20 08:45] 正在派送中；[2024-05-19 15:30] 到达目的地城市；[2024-05-18 10:00] 包裹已发出"
+}
+
+_INVENTORY = {
+    "A001": 150,
+    "B002": 30,
+    "C003": 0,
+    "D004": 200
+}
+_INVENTORY_RESPONSES = {product_id: f"产品 {product_id} 的库存数量为: {count}" for product_id, count in _INVENTORY.items()}
+
+# 一线城市之间适用较低的运费
+_TIER1_CITIES = frozenset(("北京", "上海", "广州", "深圳"))
+
 def track_package(tracking_number: str) -> str:
     """物流单号查询工具，输入物流单号，返回物流信息"""
-    if tracking_number == "SF123456":
-        return "当前物流信息: [2024-05-20 10:30] 已签收，签收人: 张三；[2024-05-20 08:45] 正在派送中；[2024-05-19 15:30] 到达目的地城市；[2024-05-18 10:00] 包裹已发出"
-    return f"未找到物流单号 {tracking_number} 的信息"
+    return _TRACKING_RESPONSES.get(tracking_number) or f"未找到物流单号 {tracking_number} 的信息"
 
 def calculate_shipping_cost(params: str) -> str:
     """计算运费，输入出发地,目的地,重量(kg)，返回运费"""
     try:
-        origin, destination, weight = params.split(",")
+        # 参数少于或多于三段时 weight 部分无法转换为浮点数，同样进入格式错误分支
+        origin, _, rest = params.partition(",")
+        destination, _, weight = rest.partition(",")
         weight = float(weight)
-        if origin in ["北京", "上海", "广州", "深圳"] and destination in ["北京", "上海", "广州", "深圳"]:
+        if origin in _TIER1_CITIES and destination in _TIER1_CITIES:
             cost = weight * 10 + 15
         else:
             cost = weight * 12 + 20
@@ -46,46 +70,31 @@ def calculate_shipping_cost(params: str) -> str:
 
 def check_inventory(product_id: str) -> str:
     """查询库存，输入产品ID，返回库存数量"""
-    inventory = {
-        "A001": 150,
-        "B002": 30,
-        "C003": 0,
-        "D004": 200
-    }
-    if product_id in inventory:
-        return f"产品 {product_id} 的库存数量为: {inventory[product_id]}"
-    return f"未找到产品 {product_id} 的库存信息"
-
-# 主函数
-def main():
-    # 配置日志
-    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    
-    print("=== 物流 ReACT Agent===")
-    
-    try:
-        # 1. 创建工具列表
-        # 定义可用工具
-        tools = [
-            Tool(
-                name="track_package",
-                func=track_package,
-                description="物流单号查询工具，输入物流单号，返回物流信息，例如：SF123456"
-            ),
-            Tool(
-                name="calculate_shipping_cost",
-                func=calculate_shipping_cost,
-                description="计算运费，输入'出发地,目的地,重量(kg)'格式，例如：北京,上海,2"
-            ),
-            Tool(
-                name="check_inventory",
-                func=check_inventory,
-                description="查询库存，输入产品ID，返回库存数量，例如：A001"
-            )
-        ]
-
-        # 2. 定义ReACT提示模板
-        react_prompt_template = """你是一个专业的物流咨询助手，需要根据用户问题，利用可用工具来帮助用户解答。
+    return _INVENTORY_RESPONSES.get(product_id) or f"未找到产品 {product_id} 的库存信息"
+
+# 可用工具：工具集固定，模块加载时创建一次
+TOOLS = [
+    Tool(
+        name="track_package",
+        func=track_package,
+        description="物流单号查询工具，输入物流单号，返回物流信息，例如：SF123456"
+    ),
+    Tool(
+        name="calculate_shipping_cost",
+        func=calculate_shipping_cost,
+        description="计算运费，输入'出发地,目的地,重量(kg)'格式，例如：北京,上海,2"
+    ),
+    Tool(
+        name="check_inventory",
+        func=check_inventory,
+        description="查询库存，输入产品ID，返回库存数量，例如：A001"
+    )
+]
+
+TOOL_DESCRIPTIONS = "\n".join(f"- {tool.name}: {tool.description}" for tool in TOOLS)
+
+# ReACT提示模板
+REACT_PROMPT_TEMPLATE = """你是一个专业的物流咨询助手，需要根据用户问题，利用可用工具来帮助用户解答。
 
 可用工具：
 {tools}
@@ -106,25 +115,45 @@ Begin!
 Question: {input}
 Thought:{agent_scratchpad}"""
 
-        # 3. 创建提示模板
-        prompt = PromptTemplate(
-            template=react_prompt_template,
-            input_variables=["input", "agent_scratchpad"],
-            partial_variables={"tools": "\n".join([f"- {tool.name}: {tool.description}" for tool in tools])},
-        )
-
-        # 4. 初始化Tongyi模型和create_react_agent
-        model = Tongyi(temperature=0)
-        agent = create_react_agent(model, tools, prompt)
-        agent_executor = AgentExecutor(
-            agent=agent,
-            tools=tools, 
-            verbose=True,
-            handle_parsing_errors=True,
-            max_iterations=3,
-            return_intermediate_steps=True
-        )
-        
+PROMPT = PromptTemplate(
+    template=REACT_PROMPT_TEMPLATE,
+    input_variables=["input", "agent_scratchpad"],
+    partial_variables={"tools": TOOL_DESCRIPTIONS},
+)
+
+@lru_cache(maxsize=1)
+def get_agent_executor() -> AgentExecutor:
+    """模型与工具集固定，Agent 只构建一次，重复调用直接复用"""
+    # 流式输出：推理过程边生成边打印，不必等每一步完整返回
+    model = Tongyi(
+        temperature=0,
+        streaming=True,
+        callbacks=[StreamingStdOutCallbackHandler()],
+        cache=SQLiteCache(database_path=LLM_CACHE_PATH)
+    )
+    # create_react_agent 默认会按自己的格式重新渲染 tools，这里直接复用预先拼好的工具描述
+    agent = create_react_agent(model, TOOLS, PROMPT, tools_renderer=lambda _: TOOL_DESCRIPTIONS)
+    return AgentExecutor(
+        agent=agent,
+        tools=TOOLS,
+        verbose=False,  # 推理过程已流式打印，工具结果在下方逐步输出
+        handle_parsing_errors=True,
+        max_iterations=3,
+        return_intermediate_steps=True,
+        # 以 invoke 调用模型：LLM.stream 不查询缓存，而 streaming=True 时 invoke 同样逐 token 回调输出
+        stream_runnable=False
+    )
+
+# 主函数
+def main():
+    # 配置日志
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
+    print("=== 物流 ReACT Agent===")
+    
+    try:
+        agent_executor = get_agent_executor()
+
         # 测试案例
         test_cases = [
             "查询快递单号 SF123456",
@@ -138,12 +167,19 @@ Thought:{agent_scratchpad}"""
             print("-" * 50)
             
             try:
-                result = agent_executor.invoke({"input": question})
-                print(f"\n最终答案: {result.get('output', '无结果')}")
+                output = "无结果"
+                step_count = 0
+                for chunk in agent_executor.stream({"input": question}):
+                    # 每个工具调用完成后立即输出结果
+                    for step in chunk.get("steps", []):
+                        step_count += 1
+                        print(f"\nObservation: {step.observation}")
+                    if "output" in chunk:
+                        output = chunk["output"]
+                print(f"\n最终答案: {output}")
                 
                 # 显示中间步骤
-                if 'intermediate_steps' in result:
-                    print(f"执行步骤数: {len(result['intermediate_steps'])}")
+                print(f"执行步骤数: {step_count}")
                     
             except Exception as e:
                 print(f"Agent执行错误: {e}")
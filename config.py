@@ -829,7 +829,8 @@ class Settings(BaseSettings):
             self.openai_model = self.openai_model_name
         if self.ocr_api_key:
             self.ocr_api_key = self.ocr_api_key
-        self._create_directories()
+        self._resolve_directories()
+        self.ensure_dirs()
 
     def _resolve_path(self, path_str: str) -> Path:
         """
@@ -846,11 +847,8 @@ class Settings(BaseSettings):
             return path
         return PROJECT_ROOT / path
 
-    def _create_directories(self):
-        """
-        自动创建所有需要的目录
-        在配置加载后自动调用，确保所有目录存在
-        """
+    def _resolve_directories(self):
+        """将目录配置统一解析为绝对路径"""
         self.chroma_persist_dir = str(self._resolve_path(self.chroma_persist_dir))
         self.upload_dir = str(self._resolve_path(self.upload_dir))
         self.cache_dir = str(self._resolve_path(self.cache_dir))
@@ -858,27 +856,36 @@ class Settings(BaseSettings):
         self.preview_output_dir = str(self._resolve_path(self.preview_output_dir))
         self.processed_dir = str(self._resolve_path(self.processed_dir))
 
-        # 创建向量数据库目录
-        Path(self.chroma_persist_dir).mkdir(parents=True, exist_ok=True)
-        # 创建文件上传目录
-        Path(self.upload_dir).mkdir(parents=True, exist_ok=True)
-        # 创建OCR缓存目录
-        Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
-        # 创建评估数据目录
-        Path(self.evaluation_data_dir).mkdir(parents=True, exist_ok=True)
-        # 创建预览输出目录
-        Path(self.preview_output_dir).mkdir(parents=True, exist_ok=True)
-        # 创建文档处理结果输出目录
-        Path(self.processed_dir).mkdir(parents=True, exist_ok=True)
-
-        # 创建Markdown编辑器相关目录（如果启用）
+        # Markdown编辑器相关目录（如果启用）
         if self.markdown_editor_enabled:
             self.markdown_output_dir = str(self._resolve_path(self.markdown_output_dir))
             self.frontend_static_dir = str(self._resolve_path(self.frontend_static_dir))
-            # 创建Markdown文件存储目录
-            Path(self.markdown_output_dir).mkdir(parents=True, exist_ok=True)
-            # 创建前端静态文件目录
-            Path(self.frontend_static_dir).mkdir(parents=True, exist_ok=True)
 
+    def _required_directories(self) -> set:
+        """
+        需要存在的目录集合：向量数据库、文件上传、OCR缓存、评估数据、预览输出、文档处理结果，
+        以及启用Markdown编辑器时的Markdown存储目录和前端静态文件目录（相同路径只保留一份）
+        """
+        directories = {
+            self.chroma_persist_dir,
+            self.upload_dir,
+            self.cache_dir,
+            self.evaluation_data_dir,
+            self.preview_output_dir,
+            self.processed_dir,
+        }
+        if self.markdown_editor_enabled:
+            directories.add(self.markdown_output_dir)
+            directories.add(self.frontend_static_dir)
+        return directories
+
+    def ensure_dirs(self):
+        """
+        确保所有需要的目录存在
+        已存在的目录只做一次 isdir 检查，跳过 mkdir 系统调用
+        """
+        for directory in self._required_directories():
+            if not os.path.isdir(directory):
+                os.makedirs(directory, exist_ok=True)
 
 settings = Settings()
@@ -0,0 +1,128 @@
+"""
+测试 chain._http
+验证 TokenBucket 的 RPM/TPM 等待时长、锁随事件循环重建，以及共享异步客户端可跨多次 asyncio.run 使用
+"""
+
+import sys
+from pathlib import Path
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from chain._http import TokenBucket, get_async_client
+
+
+class FakeClock:
+    """替代 time.monotonic 与 asyncio.sleep：sleep 只推进时钟并记录等待时长"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+def run_with_clock(clock: FakeClock, coro_factory):
+    async def runner():
+        with patch("chain._http.time.monotonic", clock.monotonic), \
+                patch("chain._http.asyncio.sleep", clock.sleep):
+            await coro_factory()
+    asyncio.run(runner())
+
+
+def test_token_bucket_waits_for_rpm_window():
+    """请求数达到 RPM 上限后，下一次请求等到最早的请求滑出 60 秒窗口"""
+    clock = FakeClock()
+    bucket = TokenBucket(rpm=2, tpm=1000)
+
+    async def scenario():
+        await bucket.acquire(1)
+        clock.now = 10.0
+        await bucket.acquire(1)
+        await bucket.acquire(1)
+
+    run_with_clock(clock, scenario)
+
+    assert clock.sleeps == [50.0]
+    assert clock.now == 60.0
+
+
+def test_token_bucket_waits_for_tpm_window():
+    """token 数超过 TPM 上限时等待，窗口内只有 RPM 余量不足以放行"""
+    clock = FakeClock()
+    bucket = TokenBucket(rpm=100, tpm=100)
+
+    async def scenario():
+        await bucket.acquire(80)
+        clock.now = 15.0
+        await bucket.acquire(20)
+        await bucket.acquire(30)
+
+    run_with_clock(clock, scenario)
+
+    # 第三次请求需要第一条（80 token）滑出窗口：60 - 15 = 45 秒
+    assert clock.sleeps == [45.0]
+
+
+def test_token_bucket_clamps_oversized_request():
+    """单次请求超过 TPM 时按 TPM 计，不会永久等待"""
+    clock = FakeClock()
+    bucket = TokenBucket(rpm=10, tpm=100)
+
+    run_with_clock(clock, lambda: bucket.acquire(500))
+
+    assert clock.sleeps == []
+    assert bucket._tokens_in_window == 100
+
+
+def test_token_bucket_rebuilds_lock_per_event_loop():
+    """每次 asyncio.run 都是新的事件循环，锁随之重建，不会跨循环复用"""
+    bucket = TokenBucket(rpm=10, tpm=1000)
+    locks = []
+
+    async def scenario():
+        await bucket.acquire(1)
+        locks.append(bucket._lock)
+
+    asyncio.run(scenario())
+    asyncio.run(scenario())
+
+    assert len(locks) == 2
+    assert locks[0] is not locks[1]
+
+
+class _OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+def test_shared_async_client_survives_multiple_asyncio_runs():
+    """共享客户端的连接池按事件循环区分，同步入口多次 asyncio.run 不会报 Event loop is closed"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _OkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+
+    async def fetch() -> str:
+        response = await get_async_client().get(url)
+        return response.text
+
+    try:
+        assert [asyncio.run(fetch()) for _ in range(3)] == ["ok", "ok", "ok"]
+    finally:
+        server.shutdown()
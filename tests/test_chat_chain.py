@@ -0,0 +1,49 @@
+"""
+测试 chain.chat_chain 的历史截断
+验证 _trim_history 从最新一轮向前保留对话且不超出 token 预算
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("DASHSCOPE_API_KEY", "test-key")
+
+from chain.chat_chain import MAX_HISTORY_TOKENS, _trim_history, _turn_tokens
+
+
+def _history(turns: int) -> list:
+    return [
+        {"user_message": f"第{i}个问题：" + "内容" * 100, "bot_reply": f"第{i}个回答：" + "回复" * 100}
+        for i in range(turns)
+    ]
+
+
+def test_trim_history_keeps_newest_turns_within_budget():
+    """保留的是最新的若干轮，总量不超过预算，再多一轮就会超出"""
+    history = _history(50)
+
+    kept = _trim_history(history)
+
+    assert kept
+    assert kept == history[-len(kept):]
+    assert sum(_turn_tokens(item) for item in kept) <= MAX_HISTORY_TOKENS
+    assert sum(_turn_tokens(item) for item in history[-len(kept) - 1:]) > MAX_HISTORY_TOKENS
+
+
+def test_trim_history_custom_budget():
+    """预算按参数生效：恰好容纳两轮时只保留最后两轮"""
+    history = _history(5)
+    budget = _turn_tokens(history[-1]) + _turn_tokens(history[-2])
+
+    assert _trim_history(history, max_tokens=budget) == history[-2:]
+    assert _trim_history(history, max_tokens=budget - 1) == history[-1:]
+
+
+def test_trim_history_short_or_oversized():
+    """未超预算的历史原样保留；最新一轮本身超出预算时不保留任何历史"""
+    history = _history(2)
+    assert _trim_history(history) == history
+    assert _trim_history([]) == []
+    assert _trim_history(history, max_tokens=1) == []
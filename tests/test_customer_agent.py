@@ -0,0 +1,104 @@
+"""
+测试 chain.customer_agent
+验证批处理去重后按原顺序回填独立副本、关键词路由的优先级，以及用户信息序列化缓存
+"""
+
+import os
+import sys
+from pathlib import Path
+import asyncio
+from unittest.mock import AsyncMock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("DASHSCOPE_API_KEY", "test-key")
+
+from chain.customer_agent import EnterpriseCustomerService, _serialize_user_info
+
+
+def _service_without_models() -> EnterpriseCustomerService:
+    """跳过模型初始化，只保留被测逻辑需要的属性"""
+    service = EnterpriseCustomerService.__new__(EnterpriseCustomerService)
+    service._router_ac = EnterpriseCustomerService._build_router_automaton()
+    return service
+
+
+def test_abatch_dedup_returns_independent_copies():
+    """重复查询只请求一次，结果按原顺序回填，每个位置持有独立的副本"""
+    service = _service_without_models()
+    service.aprocess_customer_inquiry = AsyncMock(
+        side_effect=lambda question, user_info: {"response": f"回复:{question}", "user": user_info["id"]}
+    )
+    inquiries = [
+        {"question": "退款", "user_info": {"id": 1, "level": "vip"}},
+        {"question": "登录失败", "user_info": {"id": 2}},
+        {"question": "退款", "user_info": {"level": "vip", "id": 1}},  # 键顺序不同，内容相同
+        {"question": "退款", "user_info": {"id": 3}},
+    ]
+
+    results = asyncio.run(service.abatch_process_inquiries(inquiries))
+
+    assert service.aprocess_customer_inquiry.await_count == 3
+    assert [r["response"] for r in results] == ["回复:退款", "回复:登录失败", "回复:退款", "回复:退款"]
+    assert [r["user"] for r in results] == [1, 2, 1, 3]
+    assert results[0] == results[2]
+    assert results[0] is not results[2]
+
+    results[0]["response"] = "已修改"
+    assert results[2]["response"] == "回复:退款"
+
+
+def test_abatch_failure_does_not_break_batch():
+    """单个查询抛出异常时返回错误响应，其余查询正常回填"""
+    service = _service_without_models()
+
+    async def process(question, user_info):
+        if question == "坏请求":
+            raise RuntimeError("boom")
+        return {"response": question}
+
+    service.aprocess_customer_inquiry = process
+    inquiries = [
+        {"question": "坏请求", "user_info": {}},
+        {"question": "好请求", "user_info": {}},
+    ]
+
+    results = asyncio.run(service.abatch_process_inquiries(inquiries))
+
+    assert results[1] == {"response": "好请求"}
+    assert results[0]["status"] == "error"
+    assert results[0]["error"] == "boom"
+
+
+def test_classify_tech_takes_precedence_over_billing():
+    """同时命中技术和账单关键词时按技术问题处理，与关键词出现顺序无关"""
+    service = _service_without_models()
+
+    assert service._classify("账单页面出现系统错误") == "tech"
+    assert service._classify("退款时提示 bug") == "tech"
+    assert service._classify("API 调用的费用怎么算") == "tech"
+
+
+def test_classify_billing_general_and_case():
+    """只命中账单关键词为 billing，均未命中为 general，英文关键词不区分大小写"""
+    service = _service_without_models()
+
+    assert service._classify("我想申请退款") == "billing"
+    assert service._classify("你们几点上班") == "general"
+    assert service._classify("") == "general"
+    assert service._classify("The API returns 500") == "tech"
+
+
+def test_serialize_user_info_distinguishes_equal_values():
+    """True、1、1.0 与 0.0、-0.0 相等且哈希相同，缓存后仍按各自的值编码"""
+    assert _serialize_user_info({"vip": 1}) == '{"vip":1}'
+    assert _serialize_user_info({"vip": True}) == '{"vip":true}'
+    assert _serialize_user_info({"vip": 1.0}) == '{"vip":1.0}'
+    assert _serialize_user_info({"balance": 0.0}) == '{"balance":0.0}'
+    assert _serialize_user_info({"balance": -0.0}) == '{"balance":-0.0}'
+
+
+def test_serialize_user_info_nested_values():
+    """嵌套值不走缓存，直接编码"""
+    assert _serialize_user_info({"tags": ["vip"], "id": 1}) == '{"tags":["vip"],"id":1}'
+    assert _serialize_user_info({"vip": (True,)}) == '{"vip":[true]}'
+    assert _serialize_user_info({"vip": (1,)}) == '{"vip":[1]}'
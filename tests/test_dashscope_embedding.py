@@ -0,0 +1,37 @@
+"""
+测试 chain.dashscope_embedding 的问题路由
+验证导入模块时不请求向量化接口，路由描述向量在首次路由时计算一次
+"""
+
+import os
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("DASHSCOPE_API_KEY", "test-key")
+
+with patch("langchain_community.embeddings.DashScopeEmbeddings.embed_documents") as import_embed:
+    from chain import dashscope_embedding
+
+
+def test_import_does_not_embed():
+    """导入模块时不发起向量化请求"""
+    import_embed.assert_not_called()
+
+
+def test_route_embeds_descriptions_once():
+    """描述向量只计算一次，问题按余弦相似度路由到最接近的描述"""
+    fake = MagicMock()
+    fake.embed_documents.return_value = [[1.0, 0.0], [0.0, 1.0]]  # physics, math
+    fake.embed_query.side_effect = lambda text: [0.1, 0.9] if "积分" in text else [0.9, 0.1]
+
+    dashscope_embedding.get_description_embeddings.cache_clear()
+    dashscope_embedding.get_relevant_chain_name.cache_clear()
+    with patch.object(dashscope_embedding, "get_embedding", return_value=fake):
+        assert dashscope_embedding.get_relevant_chain_name("定积分怎么算") == "math"
+        assert dashscope_embedding.get_relevant_chain_name("牛顿第一定律是什么") == "physics"
+
+    fake.embed_documents.assert_called_once_with(dashscope_embedding.descriptions)
+    dashscope_embedding.get_description_embeddings.cache_clear()
+    dashscope_embedding.get_relevant_chain_name.cache_clear()
@@ -0,0 +1,107 @@
+"""
+测试 chain.memory 的 token 计数与窗口截断
+验证 cached_token_counter 的缓存键与计数结果，以及 trim_window 的预算和边界
+"""
+
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("DASHSCOPE_API_KEY", "test-key")
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+from chain.memory import _tokens
+from chain.memory._tokens import _cache_key, cached_token_counter
+from chain.memory.window_mem import WINDOW_MAX_TOKENS, trim_window
+
+
+def test_cache_key_prefers_message_id():
+    """带 id 的消息按 (类型, id) 缓存，内容不参与"""
+    assert _cache_key(HumanMessage(content="你好", id="m1")) == ("human", "m1")
+    assert _cache_key(AIMessage(content="别的内容", id="m1")) == ("ai", "m1")
+
+
+def test_cache_key_without_id_uses_type_and_content():
+    """没有 id 的消息按类型和内容区分，非字符串内容使用 repr"""
+    assert _cache_key(HumanMessage(content="你好")) == ("human", "你好")
+    assert _cache_key(HumanMessage(content="你好")) != _cache_key(AIMessage(content="你好"))
+
+    blocks = [{"type": "text", "text": "你好"}]
+    assert _cache_key(HumanMessage(content=blocks)) == ("human", repr(blocks))
+
+
+def test_cached_token_counter_matches_approximation_and_caches():
+    """计数结果与 count_tokens_approximately 一致，已计算过的消息不再重复计算"""
+    _tokens._token_cache.clear()
+    messages = [HumanMessage(content="今天天气怎么样", id="h1"), AIMessage(content="晴天", id="a1")]
+    expected = count_tokens_approximately(messages)
+
+    with patch.object(_tokens, "count_tokens_approximately", wraps=count_tokens_approximately) as counter:
+        assert cached_token_counter(messages) == expected
+        assert counter.call_count == 2
+        assert cached_token_counter(messages) == expected
+        assert counter.call_count == 2
+
+        cached_token_counter(messages + [HumanMessage(content="明天呢", id="h2")])
+        assert counter.call_count == 3
+
+
+def test_cached_token_counter_evicts_oldest(monkeypatch):
+    """缓存条目超过上限时淘汰最久未使用的消息"""
+    _tokens._token_cache.clear()
+    monkeypatch.setattr(_tokens, "TOKEN_CACHE_SIZE", 2)
+
+    for i in range(3):
+        cached_token_counter([HumanMessage(content="消息", id=f"m{i}")])
+
+    assert list(_tokens._token_cache) == [("human", "m1"), ("human", "m2")]
+
+
+def _conversation(turns: int) -> list:
+    messages = []
+    for i in range(turns):
+        messages.append(HumanMessage(content=f"第{i}个问题：" + "内容" * 40, id=f"h{i}"))
+        messages.append(AIMessage(content=f"第{i}个回答：" + "回复" * 40, id=f"a{i}"))
+    messages.append(HumanMessage(content="最新的问题", id="latest"))
+    return messages
+
+
+def test_trim_window_keeps_latest_messages_within_budget():
+    """截断后的窗口不超过预算，以人类消息开头，并保留最新的一条消息"""
+    messages = _conversation(20)
+
+    window = trim_window(messages)
+
+    assert cached_token_counter(window) <= WINDOW_MAX_TOKENS
+    assert window[0].type == "human"
+    assert window[-1].id == "latest"
+    assert window == messages[-len(window):]
+    # 再多保留一轮就会超出预算
+    assert cached_token_counter(messages[-len(window) - 2:]) > WINDOW_MAX_TOKENS
+
+
+def test_trim_window_short_history_is_unchanged():
+    """未超出预算的历史原样保留"""
+    messages = [HumanMessage(content="你好", id="h"), AIMessage(content="你好！", id="a"),
+                HumanMessage(content="在吗", id="h2")]
+
+    assert trim_window(messages) == messages
+
+
+def test_trim_window_drops_trailing_ai_and_leading_non_human():
+    """末尾只保留到人类或工具消息，开头跳过非人类消息"""
+    messages = [
+        AIMessage(content="开场白", id="a0"),
+        HumanMessage(content="查一下天气", id="h1"),
+        AIMessage(content="", id="a1", tool_calls=[{"name": "get_weather", "args": {"city": "北京"}, "id": "c1"}]),
+        ToolMessage(content="晴", tool_call_id="c1", id="t1"),
+        AIMessage(content="北京晴", id="a2"),
+    ]
+
+    window = trim_window(messages)
+
+    assert [m.id for m in window] == ["h1", "a1", "t1"]
@@ -0,0 +1,52 @@
+"""
+测试 chain.rag_autogen._client
+验证共享模型客户端按 AutoGen 惯例 close() 后，进程级连接池仍可继续使用
+"""
+
+import os
+import sys
+from pathlib import Path
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("DASHSCOPE_API_KEY", "test-key")
+
+pytest.importorskip("autogen_ext.models.openai")
+
+from chain._http import get_async_client
+from chain.rag_autogen._client import get_model_client
+
+
+class _OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+def test_closing_model_client_keeps_shared_pool_open():
+    """借用方关闭模型客户端不会关闭共享连接池，之后的请求照常发送"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _OkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+
+    async def close_then_fetch() -> str:
+        await get_model_client().close()
+        response = await get_async_client().get(url)
+        return response.text
+
+    try:
+        assert get_model_client() is get_model_client()
+        assert [asyncio.run(close_then_fetch()) for _ in range(2)] == ["ok", "ok"]
+    finally:
+        server.shutdown()
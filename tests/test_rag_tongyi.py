@@ -0,0 +1,36 @@
+"""
+测试 chain.rag_langgraph.rag_tongyi 的订单号校验
+"""
+
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("DASHSCOPE_API_KEY", "test-key")
+
+rag_tongyi = importlib.import_module("chain.rag_langgraph.rag_tongyi")
+
+
+@pytest.mark.parametrize("text", ["1234567890", "12345678901", "123456789012"])
+def test_valid_order_ids(text):
+    """10 到 12 位 ASCII 数字是合法订单号"""
+    assert rag_tongyi.is_valid_order_id(text)
+
+
+@pytest.mark.parametrize("text", [
+    "123456789",         # 过短
+    "1234567890123",     # 过长
+    "12345abcde",        # 含字母
+    "12345 67890",       # 含空格
+    "",
+    "１２３４５６７８９０",  # 全角数字
+    "123456789²",        # 上标数字
+    "١٢٣٤٥٦٧٨٩٠",        # 阿拉伯-印度数字
+])
+def test_invalid_order_ids(text):
+    """长度不符或含非 ASCII 数字时拒绝，即使 str.isdigit 会接受"""
+    assert not rag_tongyi.is_valid_order_id(text)
@@ -0,0 +1,74 @@
+"""
+测试 chain.memory.semantic_cache
+验证缓存只在用户、上下文与问题实体都相同时命中，以及每个用户的记录数上限
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("DASHSCOPE_API_KEY", "test-key")
+
+from chain.memory import semantic_cache
+from chain.memory.semantic_cache import SemanticCache, context_fingerprint
+
+
+class FixedEmbeddings:
+    """所有文本返回同一向量，模拟语义高度相近的问题"""
+
+    def embed_query(self, text):
+        return [1.0, 0.0, 0.0, 0.0]
+
+
+def _cache(tmp_path) -> SemanticCache:
+    return SemanticCache(FixedEmbeddings(), index_path=str(tmp_path))
+
+
+def test_fingerprint_separates_entities_and_context():
+    """问题中的单号不同或检索到的上下文不同时指纹不同，单号大小写不影响"""
+    context = "相关历史信息: 暂无相关历史记录"
+
+    assert context_fingerprint("SF1 到哪了", context) != context_fingerprint("SF2 到哪了", context)
+    assert context_fingerprint("sf1 到哪了", context) == context_fingerprint("帮我查下SF1到哪了", context)
+    assert context_fingerprint("我的包裹到哪了", context) != context_fingerprint("我的包裹到哪了", "相关历史信息: 已签收")
+
+
+def test_lookup_requires_same_fingerprint(tmp_path):
+    """语义相近的问题只有指纹相同时才命中，其他用户的记录不参与检索"""
+    cache = _cache(tmp_path)
+    context = "相关历史信息: 暂无相关历史记录"
+    vector = cache.embed("SF1 到哪了")
+    cache.add(vector, "alice", context_fingerprint("SF1 到哪了", context), "SF1 正在派送")
+
+    assert cache.lookup(vector, "alice", context_fingerprint("SF1 现在在哪", context)) == "SF1 正在派送"
+    assert cache.lookup(vector, "alice", context_fingerprint("SF2 到哪了", context)) is None
+    assert cache.lookup(vector, "alice", context_fingerprint("SF1 到哪了", "相关历史信息: 已签收")) is None
+    assert cache.lookup(vector, "bob", context_fingerprint("SF1 现在在哪", context)) is None
+
+
+def test_entries_per_user_are_capped(tmp_path, monkeypatch):
+    """超出上限时淘汰最早的记录，其余记录的向量与回复仍一一对应"""
+    monkeypatch.setattr(semantic_cache, "MAX_ENTRIES_PER_USER", 2)
+    cache = _cache(tmp_path)
+    vector = cache.embed("问题")
+
+    for i in range(3):
+        cache.add(vector, "alice", f"fp{i}", f"回复{i}")
+
+    assert cache.indexes["alice"].ntotal == 2
+    assert cache.lookup(vector, "alice", "fp0") is None
+    assert cache.lookup(vector, "alice", "fp1") == "回复1"
+    assert cache.lookup(vector, "alice", "fp2") == "回复2"
+
+
+def test_save_and_reload(tmp_path):
+    """保存后重新加载，记录与指纹保持不变"""
+    cache = _cache(tmp_path)
+    vector = cache.embed("问题")
+    cache.add(vector, "team/alice", "fp", "回复")
+    assert cache.save()
+
+    reloaded = _cache(tmp_path)
+    assert reloaded.lookup(vector, "team/alice", "fp") == "回复"
+    assert reloaded.lookup(vector, "team/alice", "other") is None
@@ -0,0 +1,90 @@
+"""
+测试 chain.memory.vector_mem 的分区存储
+验证 LRU 淘汰时有改动的分区会写回磁盘，再次访问时从磁盘加载
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("DASHSCOPE_API_KEY", "test-key")
+
+from chain.memory import vector_mem
+from chain.memory.vector_mem import EMBEDDING_DIMENSION, PartitionedStore
+
+
+def _vector(seed: int) -> list:
+    return np.random.default_rng(seed).random(EMBEDDING_DIMENSION).astype("float32").tolist()
+
+
+def _texts(store) -> list:
+    return sorted(doc.page_content for doc in store.docstore._dict.values())
+
+
+def test_eviction_writes_dirty_partition_back(tmp_path):
+    """超出 max_active 时被淘汰的脏分区写回磁盘，重新访问时内容一致"""
+    stores = PartitionedStore(root=str(tmp_path), max_active=1)
+
+    alice = stores.get("alice")
+    alice.add_embeddings([("喜欢喝咖啡", _vector(1))])
+    stores.mark_dirty("alice")
+
+    stores.get("bob")
+
+    assert "alice" not in stores._active
+    assert "alice" not in stores._dirty
+    assert (tmp_path / "alice" / "index.faiss").exists()
+
+    reloaded = stores.get("alice")
+    assert reloaded is not alice
+    assert _texts(reloaded) == ["喜欢喝咖啡"]
+
+
+def test_eviction_skips_clean_partition(tmp_path):
+    """未标记改动的分区淘汰时不写盘，也不能以 create=False 取回"""
+    stores = PartitionedStore(root=str(tmp_path), max_active=1)
+
+    stores.get("alice")
+    stores.get("bob")
+
+    assert not (tmp_path / "alice").exists()
+    assert stores.get("alice", create=False) is None
+
+
+def test_save_all_and_user_id_quoting(tmp_path):
+    """save_all 写回所有脏分区，用户 ID 中的路径分隔符会被转义"""
+    stores = PartitionedStore(root=str(tmp_path), max_active=4)
+
+    store = stores.get("team/alice")
+    store.add_embeddings([("住在上海", _vector(2))])
+    stores.mark_dirty("team/alice")
+    stores.save_all()
+
+    assert not stores._dirty
+    assert (tmp_path / "team%2Falice" / "index.faiss").exists()
+    assert _texts(PartitionedStore(root=str(tmp_path)).get("team/alice", create=False)) == ["住在上海"]
+
+
+def test_search_holds_partition_lock(tmp_path, monkeypatch):
+    """检索在 recall_stores.lock 内执行，不会与后台写入并发访问 HNSW 索引"""
+    stores = PartitionedStore(root=str(tmp_path), max_active=4)
+    monkeypatch.setattr(vector_mem, "recall_stores", stores)
+    store = stores.get("alice")
+    store.add_embeddings([("喜欢喝咖啡", _vector(1))])
+
+    search = store.similarity_search_by_vector
+    held = []
+
+    def search_checking_lock(*args, **kwargs):
+        # 记录调用检索时当前线程是否持有分区锁
+        held.append(stores.lock._is_owned())
+        return search(*args, **kwargs)
+
+    monkeypatch.setattr(store, "similarity_search_by_vector", search_checking_lock)
+
+    assert vector_mem._search_memories("alice", _vector(1), 3) == ["喜欢喝咖啡"]
+    assert vector_mem._search_memories("bob", _vector(1), 3) == []
+    assert held == [True]
@@ -6,6 +6,7 @@ LastEditTime: 2025-12-03 07:57:40
 FilePath: /RAG_service/utils/request_backof.py
 Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查看配置 进行设置: https://github.com/OBKoro1/koro1FileHeader/wiki/%E9%85%8D%E7%BD%AE
 '''
+import asyncio
 import logging
 import time
 from functools import wraps
@@ -55,3 +56,34 @@ def timeout_handler(time_seconds = 30.0):
                 signal.signal(signal.SIGALRM, old_handler)
         return wrapper
     return decorator
+
+
+def aretry_with_backoff(max_attempts = 3,base_delay = 1.0):
+    """异步重试装饰器，实现指数退避，等待期间不阻塞事件循环"""
+    def decoration(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            for attempt in range(max_attempts):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    if attempt == max_attempts - 1:
+                        raise e
+                    delay = base_delay * (2 ** attempt)
+                    logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay} seconds...")
+                    await asyncio.sleep(delay)
+        return wrapper
+    return decoration
+
+def atimeout_handler(time_seconds = 30.0):
+    """异步超时控制装饰器，基于 asyncio.wait_for，可在任意线程的事件循环中使用"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await asyncio.wait_for(func(*args, **kwargs), timeout=time_seconds)
+            except asyncio.TimeoutError:
+                logger.error(f"操作超时: {time_seconds}秒")
+                raise TimeoutError(f"操作超时 ({time_seconds}秒)")
+        return wrapper
+    return decorator